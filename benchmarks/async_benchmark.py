@@ -0,0 +1,158 @@
+"""
+Compare sync gunicorn workers (wsgi.py) with the ASGI entry point (asgi.py).
+
+    python benchmarks/async_benchmark.py --workers 2 --concurrency 64
+
+Seeds --planets Planets, --people People and --users users with
+--favorites favorites each into a fresh SQLite file (or --database-url),
+then for each server model starts the server, drives every URL in PATHS
+with --concurrency client threads for --seconds, and prints throughput
+and latency percentiles per server and path as JSON:
+
+- wsgi: gunicorn --workers N wsgi (one request per worker at a time)
+- asgi: uvicorn --workers N asgi:application (aiosqlite / asyncpg)
+
+With a local SQLite file there is almost no I/O wait for the async model
+to overlap; point --database-url at a Postgres on another host to see the
+difference the network round trip makes. Requires gunicorn and uvicorn on
+PATH.
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+sys.path.insert(0, SRC)
+
+from seeding import reset_database, seed_catalog  # noqa: E402
+
+PATHS = [
+    "/users/{user}/favorites",
+    "/users/{user}/favorites?expand=1",
+    "/planets?climate=arid&limit=50",
+    "/people?sort=-height&limit=50",
+]
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def start_server(kind, args, port, env):
+    if kind == "wsgi":
+        cmd = ["gunicorn", "wsgi", "--chdir", SRC, "--workers", str(args.workers),
+               "--bind", f"127.0.0.1:{port}", "--log-level", "warning"]
+    else:
+        cmd = ["uvicorn", "asgi:application", "--app-dir", SRC, "--workers", str(args.workers),
+               "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning", "--no-access-log"]
+    server = subprocess.Popen(cmd, env=env, start_new_session=True)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            connection.request("GET", "/users/1/favorites")
+            connection.getresponse().read()
+            return server
+        except OSError:
+            time.sleep(0.2)
+    stop_server(server)
+    raise RuntimeError(f"{kind} server did not start on port {port}")
+
+
+def stop_server(server):
+    os.killpg(server.pid, signal.SIGTERM)
+    server.wait(timeout=30)
+
+
+def drive(port, path_template, args):
+    """Run --concurrency keep-alive clients against one path for --seconds."""
+    latencies, errors = [], []
+    lock = threading.Lock()
+    stop_at = time.monotonic() + args.seconds
+
+    def client(seed):
+        rng = random.Random(seed)
+        connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        mine, failed = [], 0
+        while time.monotonic() < stop_at:
+            path = path_template.format(user=rng.randint(1, args.users))
+            started = time.perf_counter()
+            try:
+                connection.request("GET", path)
+                response = connection.getresponse()
+                response.read()
+                if response.status != 200:
+                    failed += 1
+            except (OSError, http.client.HTTPException):
+                failed += 1
+                connection.close()
+                connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+                continue
+            mine.append(time.perf_counter() - started)
+        connection.close()
+        with lock:
+            latencies.extend(mine)
+            errors.append(failed)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(args.concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    if not latencies:
+        return {"requests": 0, "errors": sum(errors)}
+    return {
+        "requests": len(latencies),
+        "errors": sum(errors),
+        "rps": round(len(latencies) / args.seconds, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--planets", type=int, default=10_000)
+    parser.add_argument("--people", type=int, default=10_000)
+    parser.add_argument("--users", type=int, default=1_000)
+    parser.add_argument("--favorites", type=int, default=20)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--database-url", default="sqlite:////tmp/async_benchmark.db")
+    args = parser.parse_args()
+
+    reset_database(args.database_url)
+    from app import app
+    from models import db
+
+    with app.app_context():
+        db.create_all()
+        seed_catalog(db, random.Random(42), args.planets, args.people, args.users, args.favorites)
+
+    env = dict(os.environ)
+    results = {"workers": args.workers, "concurrency": args.concurrency}
+    for offset, kind in enumerate(("wsgi", "asgi")):
+        port = args.port + offset
+        server = start_server(kind, args, port, env)
+        try:
+            results[kind] = {path: drive(port, path, args) for path in PATHS}
+        finally:
+            stop_server(server)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
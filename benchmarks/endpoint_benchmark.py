@@ -0,0 +1,399 @@
+"""
+Latency, throughput, SQL statement count and memory for every endpoint.
+
+    python benchmarks/endpoint_benchmark.py --people 100000 --output before.json
+    git checkout <other commit>
+    python benchmarks/endpoint_benchmark.py --people 100000 --output after.json
+    python benchmarks/endpoint_benchmark.py --compare before.json after.json
+
+Seeds a fresh SQLite file (or --database-url) with --planets Planets,
+--people People and --users users holding --favorites favorites each,
+then sends --requests requests (after --warmup) to every entry in
+ENDPOINTS and reports per endpoint:
+
+- p50/p95/p99 latency in ms and throughput in requests/s
+- SQL statements per request (mean and max, from the Server-Timing header)
+- error count (responses with status >= 400)
+- peak RSS in MB so far: of this process in-process, of the largest
+  gunicorn process otherwise
+
+--mode inprocess (default) drives the Flask test client in this process.
+--mode gunicorn starts ``gunicorn wsgi`` with --workers workers and drives
+it over HTTP with --concurrency client threads; --url benchmarks an
+already running server instead (RSS is then not reported). --only/--skip
+take regular expressions over endpoint names, e.g. ``--skip '^GET /people$'``
+to leave out full-catalog dumps on a 1M row seed.
+"""
+import argparse
+import http.client
+import itertools
+import json
+import os
+import random
+import re
+import resource
+import signal
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+SRC = os.path.join(BENCHMARKS, "..", "src")
+sys.path.insert(0, SRC)
+
+from seeding import reset_database, seed_catalog, planet_record, people_record  # noqa: E402
+
+_SERVER_TIMING_STATEMENTS = re.compile(r'desc="(\d+) statements"')
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[index]
+
+
+class State:
+    """Sizes of the seeded catalog plus ids created by earlier POSTs."""
+
+    def __init__(self, args):
+        self.planets = args.planets
+        self.people = args.people
+        self.users = args.users
+        self.created = {"planets": [], "people": [], "users": []}
+        self._uids = itertools.count(10_000_000)
+        self._lock = threading.Lock()
+
+    def uid(self):
+        with self._lock:
+            return next(self._uids)
+
+    def remember(self, kind, body):
+        if isinstance(body, dict) and "id" in body:
+            with self._lock:
+                self.created[kind].append(body["id"])
+
+    def take(self, kind):
+        with self._lock:
+            return self.created[kind].pop() if self.created[kind] else None
+
+
+def _favorite_items(rng, state, count):
+    items = []
+    for _ in range(count):
+        kind = rng.choice(["planet", "people"])
+        items.append({"favorite_type": kind, "favorite_id": rng.randint(1, state.planets if kind == "planet" else state.people)})
+    return items
+
+
+def _get(path):
+    return lambda rng, state: ("GET", path(rng, state) if callable(path) else path, None)
+
+
+def _created(kind, prefix):
+    def build(rng, state):
+        entity_id = state.take(kind)
+        return None if entity_id is None else ("DELETE", f"{prefix}/{entity_id}", None)
+    return build
+
+
+# name -> build(rng, state) returning (method, path, json body), or None to skip a round.
+# POSTs run before the DELETEs that remove the rows they created, so the seeded
+# catalog is left as it was.
+ENDPOINTS = {
+    "GET /": _get("/"),
+    "GET /users": _get("/users"),
+    "GET /users?include=favorites&limit=100": _get("/users?include=favorites&limit=100"),
+    "GET /people": _get("/people"),
+    "GET /people?limit=100": _get("/people?limit=100"),
+    "GET /people?include=homeworld&limit=100": _get("/people?include=homeworld&limit=100"),
+    "GET /people?gender=female&sort=-height&limit=100": _get("/people?gender=female&sort=-height&limit=100"),
+    "GET /people/<id>": _get(lambda rng, s: f"/people/{rng.randint(1, s.people)}"),
+    "GET /people/<id>?include=homeworld": _get(lambda rng, s: f"/people/{rng.randint(1, s.people)}?include=homeworld"),
+    "GET /people/<id>/favorited-by": _get(lambda rng, s: f"/people/{rng.randint(1, s.people)}/favorited-by"),
+    "GET /planets": _get("/planets"),
+    "GET /planets?limit=100&count=1": _get("/planets?limit=100&count=1"),
+    "GET /planets?climate=arid&sort=-population&limit=100": _get("/planets?climate=arid&sort=-population&limit=100"),
+    "GET /planets?stream=1": _get("/planets?stream=1"),
+    "GET /planets/<id>": _get(lambda rng, s: f"/planets/{rng.randint(1, s.planets)}"),
+    "GET /planets/<id>/inhabitants": _get(lambda rng, s: f"/planets/{rng.randint(1, s.planets)}/inhabitants"),
+    "GET /planets/<id>/favorited-by": _get(lambda rng, s: f"/planets/{rng.randint(1, s.planets)}/favorited-by"),
+    "GET /users/<id>/favorites": _get(lambda rng, s: f"/users/{rng.randint(1, s.users)}/favorites"),
+    "GET /users/<id>/favorites?expand=1": _get(lambda rng, s: f"/users/{rng.randint(1, s.users)}/favorites?expand=1"),
+    "GET /search": _get(lambda rng, s: f"/search?q={rng.choice(['ta', 'sky', 'walk', 'd', 'ho'])}"),
+    "GET /stats/planets": _get("/stats/planets"),
+    "GET /stats/people": _get("/stats/people"),
+    "GET /stats/favorites": _get("/stats/favorites"),
+    "GET /metrics": _get("/metrics"),
+    "GET /_internal/cache": _get("/_internal/cache"),
+    "GET /_internal/pool": _get("/_internal/pool"),
+    "POST /users": lambda rng, s: ("POST", "/users", {"username": f"bench{s.uid()}", "email": f"bench{s.uid()}@example.com"}),
+    "PUT /users/<id>": lambda rng, s: ("PUT", f"/users/{(i := rng.randint(1, s.users))}", {"username": f"user{i}"}),
+    "POST /planets": lambda rng, s: ("POST", "/planets", planet_record(rng, s.uid())),
+    "PUT /planets/<id>": lambda rng, s: ("PUT", f"/planets/{rng.randint(1, s.planets)}", {"population": rng.randint(0, 10**9)}),
+    "POST /planets/bulk": lambda rng, s: ("POST", "/planets/bulk", [planet_record(rng, rng.randint(1, s.planets)) for _ in range(100)]),
+    "POST /people": lambda rng, s: ("POST", "/people", people_record(rng, s.uid(), s.planets)),
+    "PUT /people/<id>": lambda rng, s: ("PUT", f"/people/{rng.randint(1, s.people)}", {"mass": rng.randint(20, 150)}),
+    "POST /people/bulk": lambda rng, s: ("POST", "/people/bulk", [people_record(rng, rng.randint(1, s.people), s.planets) for _ in range(100)]),
+    "POST /users/<id>/favorites": lambda rng, s: ("POST", f"/users/{rng.randint(1, s.users)}/favorites", _favorite_items(rng, s, 1)[0]),
+    "DELETE /users/<id>/favorites": lambda rng, s: ("DELETE", f"/users/{rng.randint(1, s.users)}/favorites", _favorite_items(rng, s, 1)[0]),
+    "PATCH /users/<id>/favorites": lambda rng, s: ("PATCH", f"/users/{rng.randint(1, s.users)}/favorites",
+                                                   {"add": _favorite_items(rng, s, 2), "remove": _favorite_items(rng, s, 2)}),
+    "PUT /users/<id>/favorites": lambda rng, s: ("PUT", f"/users/{rng.randint(1, s.users)}/favorites", _favorite_items(rng, s, 10)),
+    "DELETE /planets/<id>": _created("planets", "/planets"),
+    "DELETE /people/<id>": _created("people", "/people"),
+    "DELETE /users/<id>": _created("users", "/users"),
+}
+
+CREATES = {"POST /planets": "planets", "POST /people": "people", "POST /users": "users"}
+
+
+class InProcessClient:
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, body):
+        response = self.client.open(path, method=method, json=body)
+        data = response.get_json(silent=True) if response.is_json else None
+        return response.status_code, response.headers.get("Server-Timing", ""), data
+
+
+class HttpClient:
+    def __init__(self, base_url):
+        parts = urlsplit(base_url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.connection = http.client.HTTPConnection(self.host, self.port, timeout=120)
+
+    def request(self, method, path, body):
+        payload = json.dumps(body).encode() if body is not None else None
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+        try:
+            self.connection.request(method, path, body=payload, headers=headers)
+            response = self.connection.getresponse()
+            raw = response.read()
+        except (OSError, http.client.HTTPException):
+            self.connection.close()
+            self.connection = http.client.HTTPConnection(self.host, self.port, timeout=120)
+            return 599, "", None
+        data = None
+        if response.getheader("Content-Type", "").startswith("application/json"):
+            try:
+                data = json.loads(raw)
+            except ValueError:
+                pass
+        return response.status, response.getheader("Server-Timing", ""), data
+
+
+def run_endpoint(name, make_client, state, args):
+    build = ENDPOINTS[name]
+    latencies, statements, errors, skipped = [], [], [], [0]
+    lock = threading.Lock()
+    per_client = max(1, (args.warmup + args.requests) // args.concurrency)
+    warmup_per_client = args.warmup // args.concurrency
+
+    def worker(seed):
+        rng = random.Random(seed)
+        client = make_client()
+        mine, counts, failed = [], [], 0
+        for round_number in range(per_client):
+            spec = build(rng, state)
+            if spec is None:
+                skipped[0] += 1
+                continue
+            method, path, body = spec
+            started = time.perf_counter()
+            status, server_timing, data = client.request(method, path, body)
+            elapsed = time.perf_counter() - started
+            if name in CREATES and status == 201:
+                state.remember(CREATES[name], data)
+            if round_number < warmup_per_client:
+                continue
+            mine.append(elapsed)
+            match = _SERVER_TIMING_STATEMENTS.search(server_timing)
+            if match:
+                counts.append(int(match.group(1)))
+            if status >= 400:
+                failed += 1
+        with lock:
+            latencies.extend(mine)
+            statements.extend(counts)
+            errors.append(failed)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(args.seed + i,)) for i in range(args.concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+
+    if not latencies:
+        return {"requests": 0, "skipped": skipped[0]}
+    return {
+        "requests": len(latencies),
+        "errors": sum(errors),
+        "rps": round(len(latencies) / wall, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "sql_mean": round(sum(statements) / len(statements), 2) if statements else None,
+        "sql_max": max(statements) if statements else None,
+    }
+
+
+def _children(pid):
+    children = []
+    for entry in os.listdir("/proc"):
+        if entry.isdigit():
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    if int(f.read().rsplit(")", 1)[1].split()[1]) == pid:
+                        children.append(int(entry))
+            except (OSError, IndexError, ValueError):
+                pass
+    return children
+
+
+def _peak_rss_mb(pid):
+    """Peak RSS (VmHWM) of the largest process in ``pid``'s process group tree."""
+    peaks = []
+    for each in [pid] + _children(pid):
+        try:
+            with open(f"/proc/{each}/status") as f:
+                for line in f:
+                    if line.startswith("VmHWM:"):
+                        peaks.append(int(line.split()[1]) / 1024)
+        except OSError:
+            pass
+    return round(max(peaks), 1) if peaks else None
+
+
+def start_gunicorn(args):
+    port = urlsplit(args.url).port
+    server = subprocess.Popen(
+        ["gunicorn", "wsgi", "--chdir", SRC, "--workers", str(args.workers),
+         "--bind", f"127.0.0.1:{port}", "--log-level", "warning", "--timeout", "300"],
+        env=dict(os.environ), start_new_session=True,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            connection.request("GET", "/_internal/pool")
+            connection.getresponse().read()
+            return server
+        except OSError:
+            time.sleep(0.2)
+    os.killpg(server.pid, signal.SIGTERM)
+    raise RuntimeError("gunicorn did not start")
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BENCHMARKS, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(before_path, after_path):
+    with open(before_path) as f:
+        before = json.load(f)
+    with open(after_path) as f:
+        after = json.load(f)
+    rows = {}
+    for name, new in after["endpoints"].items():
+        old = before["endpoints"].get(name)
+        if not old or not old.get("requests") or not new.get("requests"):
+            continue
+        rows[name] = {
+            key: {"before": old.get(key), "after": new.get(key),
+                  "change_pct": round((new[key] - old[key]) / old[key] * 100, 1) if old.get(key) and new.get(key) is not None else None}
+            for key in ("p50_ms", "p99_ms", "rps", "sql_mean")
+        }
+    print(json.dumps({"before": before["meta"], "after": after["meta"], "endpoints": rows}, indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--planets", type=int, default=10_000)
+    parser.add_argument("--people", type=int, default=10_000)
+    parser.add_argument("--users", type=int, default=1_000)
+    parser.add_argument("--favorites", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--mode", choices=["inprocess", "gunicorn"], default="inprocess")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--url", default=None, help="benchmark a running server instead of starting one")
+    parser.add_argument("--only", default=None)
+    parser.add_argument("--skip", default=None)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--database-url", default="sqlite:////tmp/endpoint_benchmark.db")
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"))
+    args = parser.parse_args()
+
+    if args.compare:
+        return compare(*args.compare)
+
+    names = [name for name in ENDPOINTS
+             if (not args.only or re.search(args.only, name)) and not (args.skip and re.search(args.skip, name))]
+    state = State(args)
+    server = None
+
+    if args.url is None:
+        reset_database(args.database_url)
+        from app import app
+        from models import db
+
+        started = time.perf_counter()
+        with app.app_context():
+            db.create_all()
+            seed_catalog(db, random.Random(args.seed), args.planets, args.people, args.users, args.favorites)
+        seed_seconds = round(time.perf_counter() - started, 1)
+    else:
+        seed_seconds = None
+
+    if args.mode == "inprocess" and args.url is None:
+        make_client = lambda: InProcessClient(app)  # noqa: E731
+    else:
+        if args.url is None:
+            args.url = "http://127.0.0.1:8766"
+            server = start_gunicorn(args)
+        make_client = lambda: HttpClient(args.url)  # noqa: E731
+
+    results = {}
+    try:
+        for name in names:
+            results[name] = run_endpoint(name, make_client, state, args)
+            if server is not None:
+                results[name]["peak_rss_mb"] = _peak_rss_mb(server.pid)
+            elif args.url is None:
+                results[name]["peak_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+            print(f"{name}: {results[name]}", file=sys.stderr)
+    finally:
+        if server is not None:
+            os.killpg(server.pid, signal.SIGTERM)
+            server.wait(timeout=30)
+
+    report = {
+        "meta": {
+            "commit": git_commit(), "mode": "http" if args.url else "inprocess", "url": args.url,
+            "database_url": args.database_url, "planets": args.planets, "people": args.people,
+            "users": args.users, "favorites": args.favorites, "requests": args.requests,
+            "concurrency": args.concurrency, "workers": args.workers if server else None,
+            "seed_seconds": seed_seconds,
+        },
+        "endpoints": results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
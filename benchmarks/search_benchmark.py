@@ -0,0 +1,115 @@
+"""
+Benchmark GET /search prefix queries over a synthetic catalog.
+
+    python benchmarks/search_benchmark.py --rows 1000000
+
+Seeds a fresh SQLite file (or the database in --database-url) with
+--rows People and --rows // 10 Planets of random multi-word names, then
+times --queries random prefixes of 1-4 letters through the Flask test
+client and prints latency percentiles as JSON.
+"""
+import argparse
+import json
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def random_name(rng):
+    words = rng.randint(1, 3)
+    return " ".join(
+        "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(3, 9))).capitalize()
+        for _ in range(words)
+    )
+
+
+def seed(db, rows, batch, rng):
+    from sqlalchemy import insert
+    from models import People, Planet
+    from search import reindex
+
+    planets = max(1, rows // 10)
+    for model, count in ((Planet, planets), (People, rows)):
+        for start in range(0, count, batch):
+            chunk = []
+            for uid in range(start + 1, min(count, start + batch) + 1):
+                record = {"uid": uid, "name": random_name(rng), "url": f"https://swapi.tech/{uid}"}
+                if model is Planet:
+                    record.update(climate="arid", diameter=1, gravity="1", orbital_period=1,
+                                  population=1, rotation_period=1, terrain="desert")
+                else:
+                    record.update(gender="n/a", skin_color="x", hair_color="x", height=1,
+                                  eye_color="x", mass=1, birth_year="x")
+                chunk.append(record)
+            connection = db.session.connection()
+            connection.execute(insert(model.__table__), chunk)
+            ids = connection.execute(
+                model.__table__.select().with_only_columns(model.id, model.name)
+                .where(model.uid.between(start + 1, start + batch))
+            )
+            reindex(connection, model.__tablename__, [(row.id, row.name) for row in ids])
+            db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--batch", type=int, default=10_000)
+    parser.add_argument("--database-url", default="sqlite:////tmp/search_benchmark.db")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    if args.database_url.startswith("sqlite:////"):
+        path = args.database_url[len("sqlite:///"):]
+        if os.path.exists(path):
+            os.remove(path)
+    os.environ["DATABASE_URL"] = args.database_url
+
+    from app import app
+    from models import db
+
+    rng = random.Random(args.seed)
+    with app.app_context():
+        db.create_all()
+        started = time.perf_counter()
+        seed(db, args.rows, args.batch, rng)
+        seed_seconds = time.perf_counter() - started
+
+    client = app.test_client()
+    prefixes = [
+        "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(1, 4)))
+        for _ in range(args.queries)
+    ]
+    timings = []
+    for prefix in prefixes:
+        started = time.perf_counter()
+        response = client.get(f"/search?q={prefix}")
+        timings.append((time.perf_counter() - started) * 1000)
+        assert response.status_code == 200, response.data
+
+    print(json.dumps({
+        "rows": args.rows,
+        "queries": args.queries,
+        "seed_seconds": round(seed_seconds, 1),
+        "latency_ms": {
+            "p50": round(percentile(timings, 50), 3),
+            "p95": round(percentile(timings, 95), 3),
+            "p99": round(percentile(timings, 99), 3),
+            "max": round(max(timings), 3),
+        },
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Synthetic catalog shared by the benchmark scripts.
+
+``seed_catalog`` writes Planets, People (with homeworlds), users and their
+favorites with multi-row Core inserts in batches, indexes names for
+/search, builds the /stats counters and bumps the table versions, so it
+stays fast at a million rows. Rows are deterministic for a given ``rng`` seed.
+"""
+import os
+
+CLIMATES = ["arid", "temperate", "frozen", "tropical", "murky"]
+TERRAINS = ["desert", "grasslands", "mountains", "jungle", "ocean", "swamp"]
+GENDERS = ["male", "female", "n/a"]
+SYLLABLES = ["ta", "too", "ine", "al", "de", "ran", "ho", "th", "en", "dor", "sky", "wal", "ker", "na", "bu"]
+
+
+def reset_database(database_url):
+    """Point the app at ``database_url``, removing an existing SQLite file."""
+    if database_url.startswith("sqlite:////"):
+        path = database_url[len("sqlite:///"):]
+        if os.path.exists(path):
+            os.remove(path)
+    os.environ["DATABASE_URL"] = database_url
+
+
+def random_name(rng):
+    return " ".join(
+        "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))).capitalize()
+        for _ in range(rng.randint(1, 2))
+    )
+
+
+def planet_record(rng, uid):
+    return {
+        "uid": uid, "name": random_name(rng), "climate": rng.choice(CLIMATES),
+        "diameter": rng.randint(1000, 20000), "gravity": "1 standard",
+        "orbital_period": rng.randint(100, 1000), "population": rng.randint(0, 10**9),
+        "rotation_period": rng.randint(10, 40), "terrain": rng.choice(TERRAINS),
+        "url": f"https://www.swapi.tech/api/planets/{uid}",
+    }
+
+
+def people_record(rng, uid, planets):
+    return {
+        "uid": uid, "name": random_name(rng), "gender": rng.choice(GENDERS),
+        "skin_color": "fair", "hair_color": "blond", "height": rng.randint(60, 230),
+        "eye_color": "blue", "mass": rng.randint(20, 150), "homeworld": rng.randint(1, planets),
+        "birth_year": f"{rng.randint(1, 900)}BBY", "url": f"https://www.swapi.tech/api/people/{uid}",
+    }
+
+
+def seed_catalog(db, rng, planets, people, users, favorites_per_user, batch=10_000):
+    from sqlalchemy import insert
+    from models import Planet, People, User, favorites, bump_table_versions
+    from search import reindex
+    from stats import rebuild_stats
+
+    def insert_batched(model, count, build):
+        for start in range(1, count + 1, batch):
+            rows = [build(i) for i in range(start, min(count, start + batch - 1) + 1)]
+            connection = db.session.connection()
+            connection.execute(insert(model.__table__), rows)
+            if model in (Planet, People):
+                reindex(connection, model.__tablename__, [(row["id"], row["name"]) for row in rows])
+            db.session.commit()
+
+    def planet_row(i):
+        return {"id": i, **planet_record(rng, i)}
+
+    def people_row(i):
+        record = people_record(rng, i, planets)
+        record["homeworld_id"] = record.pop("homeworld")
+        return {"id": i, **record}
+
+    insert_batched(Planet, planets, planet_row)
+    insert_batched(People, people, people_row)
+    insert_batched(User, users, lambda i: {"id": i, "username": f"user{i}", "email": f"user{i}@example.com"})
+
+    per_batch = max(1, batch // max(1, favorites_per_user))
+    for start in range(1, users + 1, per_batch):
+        rows = []
+        for user_id in range(start, min(users, start + per_batch - 1) + 1):
+            chosen = set()
+            while len(chosen) < favorites_per_user:
+                kind = rng.choice(["planet", "people"])
+                chosen.add((kind, rng.randint(1, planets if kind == "planet" else people)))
+            rows.extend({"user_id": user_id, "favorite_type": kind, "favorite_id": target} for kind, target in chosen)
+        if rows:
+            db.session.execute(insert(favorites), rows)
+        db.session.commit()
+
+    rebuild_stats(db.session.connection())
+    bump_table_versions(db.session.connection(), ["planet", "people", "user", "favorites"])
+    db.session.commit()
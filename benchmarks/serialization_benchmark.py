@@ -0,0 +1,100 @@
+"""
+Compare the ORM + serialize() list path with the Core tuple fast path.
+
+    python benchmarks/serialization_benchmark.py --rows 100000
+
+Seeds --rows Planets into a fresh SQLite file, then for each path runs
+--repeat rounds of "load every row and encode the JSON body" and prints
+rows/sec (best run) and peak traced memory (tracemalloc) as JSON:
+
+- orm_stdlib: Planet.query.all() + serialize() + stdlib json
+- core_stdlib: Core column tuples zipped with field names + stdlib json
+- core_fast: Core column tuples + the app's JSON provider (orjson when installed)
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+
+def seed(db, rows, batch=10_000):
+    from sqlalchemy import insert
+    from models import Planet
+
+    for start in range(0, rows, batch):
+        db.session.execute(insert(Planet.__table__), [
+            {"uid": uid, "name": f"Planet {uid}", "climate": "arid", "diameter": 10465,
+             "gravity": "1 standard", "orbital_period": 304, "population": 200000,
+             "rotation_period": 23, "terrain": "desert",
+             "url": f"https://www.swapi.tech/api/planets/{uid}"}
+            for uid in range(start + 1, min(rows, start + batch) + 1)
+        ])
+    db.session.commit()
+
+
+def measure(fn, repeat):
+    """Best wall time over ``repeat`` runs, then one traced run for peak memory."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        size = len(fn())
+        timings.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return min(timings), peak, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--database-url", default="sqlite:////tmp/serialization_benchmark.db")
+    args = parser.parse_args()
+
+    if args.database_url.startswith("sqlite:////"):
+        path = args.database_url[len("sqlite:///"):]
+        if os.path.exists(path):
+            os.remove(path)
+    os.environ["DATABASE_URL"] = args.database_url
+
+    from app import app
+    from models import db, Planet
+    from filters import PLANET_SPEC, catalog_select, list_catalog
+
+    with app.app_context():
+        db.create_all()
+        seed(db, args.rows)
+
+    def orm_stdlib():
+        with app.app_context():
+            return json.dumps([planet.serialize() for planet in Planet.query.all()], separators=(",", ":")).encode()
+
+    def core_stdlib():
+        with app.test_request_context("/planets"):
+            return json.dumps(list_catalog(*catalog_select(PLANET_SPEC)), separators=(",", ":")).encode()
+
+    def core_fast():
+        with app.test_request_context("/planets"):
+            return app.json.dumps_bytes(list_catalog(*catalog_select(PLANET_SPEC)))
+
+    results = {"rows": args.rows}
+    for name, fn in (("orm_stdlib", orm_stdlib), ("core_stdlib", core_stdlib), ("core_fast", core_fast)):
+        seconds, peak, size = measure(fn, args.repeat)
+        results[name] = {
+            "rows_per_sec": round(args.rows / seconds),
+            "seconds": round(seconds, 3),
+            "peak_mb": round(peak / 1024 / 1024, 1),
+            "body_bytes": size,
+        }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+"""indexes on filterable/sortable catalog columns
+
+Revision ID: 2f8a6c0d4b17
+Revises: 9d4b7e21c6f8
+Create Date: 2026-10-18 10:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2f8a6c0d4b17'
+down_revision = '9d4b7e21c6f8'
+branch_labels = None
+depends_on = None
+
+INDEXES = {
+    'planet': ['name', 'climate', 'diameter', 'population', 'terrain'],
+    'people': ['name', 'gender', 'height', 'mass', 'homeworld_id'],
+}
+
+
+def upgrade():
+    for table, columns in INDEXES.items():
+        for column in columns:
+            op.create_index(op.f(f'ix_{table}_{column}'), table, [column], unique=False)
+
+
+def downgrade():
+    for table, columns in INDEXES.items():
+        for column in columns:
+            op.drop_index(op.f(f'ix_{table}_{column}'), table_name=table)
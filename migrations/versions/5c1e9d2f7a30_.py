@@ -0,0 +1,42 @@
+"""add version/updated_at columns and table_version markers
+
+Revision ID: 5c1e9d2f7a30
+Revises: a4b2528c7bdc
+Create Date: 2026-10-18 09:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5c1e9d2f7a30'
+down_revision = 'a4b2528c7bdc'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ('user', 'planet', 'people'):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+            batch_op.add_column(sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False))
+
+    table_version = op.create_table('table_version',
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    op.bulk_insert(table_version, [
+        {'name': name, 'version': 1}
+        for name in ('user', 'planet', 'people', 'favorites')
+    ])
+
+
+def downgrade():
+    op.drop_table('table_version')
+    for table in ('people', 'planet', 'user'):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_column('updated_at')
+            batch_op.drop_column('version')
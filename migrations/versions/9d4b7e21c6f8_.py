@@ -0,0 +1,45 @@
+"""composite primary key and type/id index on favorites
+
+Revision ID: 9d4b7e21c6f8
+Revises: 5c1e9d2f7a30
+Create Date: 2026-10-18 10:05:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9d4b7e21c6f8'
+down_revision = '5c1e9d2f7a30'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.drop_constraint('favorites_pkey', 'favorites', type_='primary')
+        op.create_primary_key('favorites_pkey', 'favorites', ['user_id', 'favorite_type', 'favorite_id'])
+    else:
+        with op.batch_alter_table('favorites', schema=None, recreate='always') as batch_op:
+            batch_op.create_primary_key('favorites_pkey', ['user_id', 'favorite_type', 'favorite_id'])
+
+    op.create_index('ix_favorites_type_id', 'favorites', ['favorite_type', 'favorite_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_favorites_type_id', table_name='favorites')
+
+    # the old key only allows one favorite per user, keep the lowest one
+    op.execute(
+        "DELETE FROM favorites WHERE EXISTS ("
+        "SELECT 1 FROM favorites f2 WHERE f2.user_id = favorites.user_id AND "
+        "(f2.favorite_type < favorites.favorite_type OR "
+        "(f2.favorite_type = favorites.favorite_type AND f2.favorite_id < favorites.favorite_id)))"
+    )
+    if op.get_bind().dialect.name == 'postgresql':
+        op.drop_constraint('favorites_pkey', 'favorites', type_='primary')
+        op.create_primary_key('favorites_pkey', 'favorites', ['user_id'])
+    else:
+        with op.batch_alter_table('favorites', schema=None, recreate='always') as batch_op:
+            batch_op.create_primary_key('favorites_pkey', ['user_id'])
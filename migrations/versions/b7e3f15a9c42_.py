@@ -0,0 +1,59 @@
+"""search_terms prefix index for /search
+
+Revision ID: b7e3f15a9c42
+Revises: 2f8a6c0d4b17
+Create Date: 2026-10-18 11:20:00.000000
+
+"""
+import re
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7e3f15a9c42'
+down_revision = '2f8a6c0d4b17'
+branch_labels = None
+depends_on = None
+
+# copy of search.tokenize at the time of this migration
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def _tokenize(name):
+    full = " ".join(_WORD.findall((name or "").lower()))[:100]
+    terms = {}
+    if full:
+        terms[full] = 0
+    for position, word in enumerate(full.split(), start=1):
+        terms.setdefault(word, position)
+    return terms
+
+
+def upgrade():
+    search_terms = op.create_table('search_terms',
+    sa.Column('term', sa.String(length=100).with_variant(sa.String(length=100, collation='C'), 'postgresql'), nullable=False),
+    sa.Column('entity_type', sa.String(length=20), nullable=False),
+    sa.Column('entity_id', sa.Integer(), nullable=False),
+    sa.Column('position', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.PrimaryKeyConstraint('term', 'entity_type', 'entity_id')
+    )
+    op.create_index('ix_search_terms_entity', 'search_terms', ['entity_type', 'entity_id'], unique=False)
+
+    connection = op.get_bind()
+    for entity_type in ('people', 'planet'):
+        rows = connection.execute(sa.text(f'SELECT id, name FROM {entity_type}'))
+        terms = [
+            {'term': term, 'entity_type': entity_type, 'entity_id': row.id,
+             'position': position, 'name': row.name}
+            for row in rows
+            for term, position in _tokenize(row.name).items()
+        ]
+        if terms:
+            op.bulk_insert(search_terms, terms)
+
+
+def downgrade():
+    op.drop_index('ix_search_terms_entity', table_name='search_terms')
+    op.drop_table('search_terms')
@@ -0,0 +1,48 @@
+"""stat_counters summary table for /stats
+
+Revision ID: c3d9a6e1f508
+Revises: b7e3f15a9c42
+Create Date: 2026-10-18 16:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3d9a6e1f508'
+down_revision = 'b7e3f15a9c42'
+branch_labels = None
+depends_on = None
+
+# same results as stats.expected_counters at the time of this migration
+_FAVORITE_KIND = "CASE favorite_type WHEN 'character' THEN 'people' ELSE favorite_type END"
+BACKFILL = [
+    "SELECT 'planet_climate', COALESCE(climate, 'unknown'), COUNT(*), COALESCE(SUM(population), 0) FROM planet GROUP BY climate",
+    "SELECT 'planet_terrain', COALESCE(terrain, 'unknown'), COUNT(*), COALESCE(SUM(population), 0) FROM planet GROUP BY terrain",
+    "SELECT 'people_gender', COALESCE(gender, 'unknown'), COUNT(*), 0 FROM people GROUP BY gender",
+    "SELECT 'people_homeworld', COALESCE(CAST(homeworld_id AS VARCHAR(120)), 'unknown'), COUNT(*), 0 "
+    "FROM people GROUP BY homeworld_id",
+    f"SELECT 'favorite_' || {_FAVORITE_KIND}, CAST(favorite_id AS VARCHAR(120)), COUNT(*), 0 "
+    f"FROM favorites GROUP BY {_FAVORITE_KIND}, favorite_id",
+    f"SELECT 'favorite_total', {_FAVORITE_KIND}, COUNT(*), 0 FROM favorites GROUP BY {_FAVORITE_KIND}",
+]
+
+
+def upgrade():
+    op.create_table('stat_counters',
+    sa.Column('stat', sa.String(length=30), nullable=False),
+    sa.Column('key', sa.String(length=120), nullable=False),
+    sa.Column('count', sa.BigInteger(), server_default='0', nullable=False),
+    sa.Column('total', sa.BigInteger(), server_default='0', nullable=False),
+    sa.PrimaryKeyConstraint('stat', 'key')
+    )
+    op.create_index('ix_stat_counters_stat_count', 'stat_counters', ['stat', 'count'], unique=False)
+
+    for query in BACKFILL:
+        op.execute(f"INSERT INTO stat_counters (stat, key, count, total) {query}")
+
+
+def downgrade():
+    op.drop_index('ix_stat_counters_stat_count', table_name='stat_counters')
+    op.drop_table('stat_counters')
@@ -0,0 +1,42 @@
+"""store favorites of people as "character" only
+
+Revision ID: d81f4c2b6a97
+Revises: c3d9a6e1f508
+Create Date: 2026-10-18 18:05:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'd81f4c2b6a97'
+down_revision = 'c3d9a6e1f508'
+branch_labels = None
+depends_on = None
+
+# same results as stats.expected_counters at the time of this migration
+_FAVORITE_KIND = "CASE favorite_type WHEN 'character' THEN 'people' ELSE favorite_type END"
+BACKFILL = [
+    f"SELECT 'favorite_' || {_FAVORITE_KIND}, CAST(favorite_id AS VARCHAR(120)), COUNT(*), 0 "
+    f"FROM favorites GROUP BY {_FAVORITE_KIND}, favorite_id",
+    f"SELECT 'favorite_total', {_FAVORITE_KIND}, COUNT(*), 0 FROM favorites GROUP BY {_FAVORITE_KIND}",
+]
+
+
+def upgrade():
+    # a "people" row that duplicates a "character" one is the same favorite
+    op.execute(
+        "DELETE FROM favorites WHERE favorite_type = 'people' AND EXISTS ("
+        "SELECT 1 FROM favorites AS f WHERE f.user_id = favorites.user_id "
+        "AND f.favorite_id = favorites.favorite_id AND f.favorite_type = 'character')"
+    )
+    op.execute("UPDATE favorites SET favorite_type = 'character' WHERE favorite_type = 'people'")
+
+    op.execute("DELETE FROM stat_counters WHERE stat LIKE 'favorite_%'")
+    for query in BACKFILL:
+        op.execute(f"INSERT INTO stat_counters (stat, key, count, total) {query}")
+    op.execute("UPDATE table_version SET version = version + 1 WHERE name = 'favorites'")
+
+
+def downgrade():
+    pass
@@ -1,18 +1,40 @@
 """
 This module takes care of starting the API Server, Loading the DB and Adding the endpoints
 """
+import json
 import os
+import click
 from flask import Flask, request, jsonify, url_for
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import selectinload, raiseload
 from flask_migrate import Migrate
 from flask_swagger import swagger
 from flask_cors import CORS
-from utils import APIException, generate_sitemap
+from utils import APIException, generate_sitemap, list_arg, flag_arg
+from json_provider import FastJSONProvider
+from pagination import wants_pagination, pagination_args, paginate
+from filters import PEOPLE_SPEC, PLANET_SPEC, USER_SPEC, wants_query, filter_args, catalog_select, list_catalog
+from streaming import wants_stream, stream_ndjson
+from cache import catalog_cache, cached_entity, invalidate
+from conditional import conditional_collection, entity_response
+from snapshots import wants_snapshot, snapshot_response
+from singleflight import shared_json, collection_flight
+from compression import init_compression, compression_stats
+from pool import engine_options, pool_stats
+from replicas import init_replicas, replica_set
+from metrics import init_metrics, render_metrics
+from search import search, SEARCHABLE
+from stats import planet_stats, people_stats, favorite_stats, top_arg, favorite_type_arg, record_favorites, check_stats, rebuild_stats
+from bulk import read_records, chunk_size_arg, bulk_upsert, PLANET_FIELDS, PEOPLE_FIELDS, PEOPLE_COLUMNS
+from idempotency import idempotent, idempotency_store
+from writes import USER_FIELDS, create_args, update_args, create_entity, update_entity, delete_entity, clear_references, constraint_error
 from admin import setup_admin
-from models import db, User, People, Planet, favorites
+from models import db, User, People, Planet, favorites, load_favorites, attach_homeworlds, expand_favorites, bump_table_versions, sync_favorites, FAVORITE_MODELS, stored_favorite_type, dialect_insert, favorited_by_count
 #from models import Person
 
 app = Flask(__name__)
 app.url_map.strict_slashes = False
+app.json = FastJSONProvider(app)
 
 db_url = os.getenv("DATABASE_URL")
 if db_url is not None:
@@ -20,11 +42,15 @@ if db_url is not None:
 else:
     app.config['SQLALCHEMY_DATABASE_URI'] = "sqlite:////tmp/test.db"
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
 
 MIGRATE = Migrate(app, db)
 db.init_app(app)
+init_metrics(app)
+init_replicas(app)
 CORS(app)
 setup_admin(app)
+init_compression(app)
 
 # Handle/serialize errors like a JSON object
 @app.errorhandler(APIException)
@@ -37,98 +63,123 @@ def sitemap():
     return generate_sitemap(app)
 
 #users endpoins
+def _users_depends_on():
+    return ["favorites"] if "favorites" in list_arg("include") else []
+
 @app.route('/users', methods=['GET'])
+@conditional_collection("user", depends_on=_users_depends_on)
 def get_all_users():
+    page_args = pagination_args() if wants_pagination() else None
+    with_favorites = "favorites" in list_arg("include")
+    catalog = None if with_favorites else catalog_select(USER_SPEC)
+    query = User.query.filter(*filter_args(USER_SPEC)) if with_favorites else None
     try:
-        users = User.query.all()  
-        users_list = [user.serialize() for user in users] 
+        if catalog:
+            return shared_json(lambda: list_catalog(*catalog, page_args)), 200
+        if page_args:
+            return jsonify(paginate(query, User.id, User.serialize_with_favorites,
+                                    prepare=load_favorites, **page_args)), 200
+
+        users = query.all()  
+        load_favorites(users)
+        users_list = [user.serialize_with_favorites() for user in users] 
         
         return jsonify(users_list), 200
     
+    except APIException:
+        # a cursor that does not match ?sort= is the client's error
+        raise
     except Exception as e:
         return jsonify({"error": "Internal Server Error", "message": str(e)}), 500
     
 @app.route('/users', methods=['POST'])
 def create_user():
+    row = create_args(USER_FIELDS)
     try:
-        data = request.get_json()
-
-        required_fields = ['username', 'email']
-        if not all(field in data for field in required_fields):
-            return jsonify({"error": "Missing required fields"}), 400
-
-        # Optional: prevent duplicate email or username
-        if User.query.filter_by(email=data['email']).first():
-            return jsonify({"error": "Email already exists"}), 400
-
-        if User.query.filter_by(username=data['username']).first():
-            return jsonify({"error": "Username already exists"}), 400
-
-        new_user = User(
-            username=data['username'],
-            email=data['email']
-        )
-
-        db.session.add(new_user)
+        new_user = create_entity(User, row)
         db.session.commit()
-
         return jsonify(new_user.serialize()), 201
 
+    except IntegrityError as e:
+        return constraint_error(e, User)
     except Exception as e:
         return jsonify({"error": "Internal Server Error", "message": str(e)}), 500
 
 @app.route('/users/<int:user_id>', methods=['PUT'])
 def update_user(user_id):
+    row = update_args(USER_FIELDS)
     try:
-        user = User.query.get(user_id)
-        if not user:
+        user = update_entity(User, user_id, row)
+        if user is None:
             return jsonify({"error": "User not found"}), 404
 
-        data = request.get_json()
-
-        if "username" in data:
-            user.username = data["username"]
-        if "email" in data:
-            user.email = data["email"]
-
         db.session.commit()
-
         return jsonify(user.serialize()), 200
 
+    except IntegrityError as e:
+        return constraint_error(e, User)
     except Exception as e:
         return jsonify({"error": "Internal Server Error", "message": str(e)}), 500
 
 @app.route('/users/<int:user_id>', methods=['DELETE'])
 def delete_user(user_id):
     try:
-        user = User.query.get(user_id)
-        if not user:
+        if not delete_entity(User, user_id):
             return jsonify({"error": "User not found"}), 404
 
-        db.session.delete(user)
         db.session.commit()
-
         return jsonify({"message": "User deleted successfully"}), 200
 
+    except IntegrityError as e:
+        return constraint_error(e, User)
     except Exception as e:
         return jsonify({"error": "Internal Server Error", "message": str(e)}), 500
 
     
 #people Endpoints
+def _people_depends_on():
+    return ["planet"] if "homeworld" in list_arg("include") else []
+
 @app.route('/people', methods=['GET'])
+@conditional_collection("people", depends_on=_people_depends_on)
 def get_all_people():
-    people = People.query.all()
-    people_list = [character.serialize() for character in people] 
-    return jsonify(people_list), 200 
+    if wants_stream():
+        return stream_ndjson(People, filter_args(PEOPLE_SPEC))
+    if wants_snapshot():
+        return snapshot_response("people", lambda: list_catalog(*catalog_select(PEOPLE_SPEC)))
+    page_args = pagination_args() if wants_pagination() else None
+    with_homeworld = "homeworld" in list_arg("include")
+    if with_homeworld and not wants_query(PEOPLE_SPEC):
+        query = People.query.options(selectinload(People.homeworld), raiseload("*"))
+        if page_args:
+            return jsonify(paginate(query, People.id, People.serialize_with_homeworld, **page_args)), 200
+
+        people = query.all()
+        people_list = [character.serialize_with_homeworld() for character in people] 
+        return jsonify(people_list), 200 
+
+    catalog = catalog_select(PEOPLE_SPEC)
+
+    def build():
+        body = list_catalog(*catalog, page_args)
+        if with_homeworld:
+            attach_homeworlds(body["results"] if page_args else body)
+        return body
+    return shared_json(build), 200
 
 @app.route('/people/<int:people_id>', methods=['GET'])
 def get_person_by_id(people_id):
     try:
-        person = People.query.get(people_id) 
+        person = cached_entity(People, people_id)
         if person is None:
             return jsonify({"error": "Character not found"}), 404
 
-        return jsonify(person.serialize()), 200 
+        embed = None
+        homeworld_id = person["data"]["homeworld"]
+        if "homeworld" in list_arg("include"):
+            homeworld = cached_entity(Planet, homeworld_id) if homeworld_id is not None else None
+            embed = {"homeworld_planet": ("planet", homeworld_id, homeworld)}
+        return entity_response("people", people_id, person, embed)
     
     except Exception as e:
         return jsonify({"error": "Internal Server Error", "message": str(e)}), 500
@@ -136,154 +187,186 @@ def get_person_by_id(people_id):
 #Planet Endpoints
 
 @app.route('/planets', methods=['GET'])
+@conditional_collection("planet")
 def get_all_planets():
+    if wants_stream():
+        return stream_ndjson(Planet, filter_args(PLANET_SPEC))
+    if wants_snapshot():
+        return snapshot_response("planet", lambda: list_catalog(*catalog_select(PLANET_SPEC)))
+    page_args = pagination_args() if wants_pagination() else None
+    catalog = catalog_select(PLANET_SPEC)
     try:
-        planets = Planet.query.all()  # Ensure the correct model name
-        planets_list = [planet.serialize() for planet in planets]  # Correct variable name
-        return jsonify(planets_list), 200
+        return shared_json(lambda: list_catalog(*catalog, page_args)), 200
+    except APIException:
+        raise
     except Exception as e:
         return jsonify({"error": "Internal Server Error", "message": str(e)}), 500
 
 @app.route('/planets/<int:planet_id>', methods=['GET']) 
 def get_planet_by_id(planet_id): 
     try:
-        planet= Planet.query.get(planet_id)  
+        planet = cached_entity(Planet, planet_id)
         if planet is None: 
             return jsonify({"error": "Planet not found"}), 404 
 
-        return jsonify(planet.serialize()), 200  
+        return entity_response("planet", planet_id, planet)
     
     except Exception as e:
         return jsonify({"error": "Internal Server Error", "message": str(e)}), 500
     
+@app.route('/planets/<int:planet_id>/inhabitants', methods=['GET'])
+@conditional_collection("people", "planet")
+def get_planet_inhabitants(planet_id):
+    page_args = pagination_args()
+    try:
+        if cached_entity(Planet, planet_id) is None:
+            return jsonify({"error": "Planet not found"}), 404
+
+        query = People.query.filter(People.homeworld_id == planet_id).options(raiseload("*"))
+        return jsonify(paginate(query, People.id, People.serialize, **page_args)), 200
+
+    except APIException:
+        raise
+    except Exception as e:
+        return jsonify({"error": "Internal Server Error", "message": str(e)}), 500
+
+@app.route('/planets/<int:planet_id>/favorited-by', methods=['GET'])
+def get_planet_favorited_by(planet_id):
+    try:
+        return jsonify({"planet_id": planet_id, "count": favorited_by_count(Planet, planet_id)}), 200
+
+    except Exception as e:
+        return jsonify({"error": "Internal Server Error", "message": str(e)}), 500
+
+@app.route('/people/<int:people_id>/favorited-by', methods=['GET'])
+def get_person_favorited_by(people_id):
+    try:
+        return jsonify({"people_id": people_id, "count": favorited_by_count(People, people_id)}), 200
+
+    except Exception as e:
+        return jsonify({"error": "Internal Server Error", "message": str(e)}), 500
+
 @app.route('/planets', methods=['POST'])
+@idempotent
 def create_planet():
+    row = create_args(PLANET_FIELDS)
     try:
-        data = request.get_json()
-
-        required_fields = ['uid', 'name', 'climate', 'diameter', 'gravity',
-                           'orbital_period', 'population', 'rotation_period',
-                           'terrain', 'url']
-
-        if not all(field in data for field in required_fields):
-            return jsonify({"error": "Missing required planet fields"}), 400
-
-        new_planet = Planet(
-            uid=data['uid'],
-            name=data['name'],
-            climate=data['climate'],
-            diameter=data['diameter'],
-            gravity=data['gravity'],
-            orbital_period=data['orbital_period'],
-            population=data['population'],
-            rotation_period=data['rotation_period'],
-            terrain=data['terrain'],
-            url=data['url']
-        )
-
-        db.session.add(new_planet)
+        new_planet = create_entity(Planet, row)
         db.session.commit()
+        invalidate(Planet, new_planet.id)
 
         return jsonify(new_planet.serialize()), 201
 
+    except IntegrityError as e:
+        return constraint_error(e, Planet)
+    except Exception as e:
+        return jsonify({"error": "Internal Server Error", "message": str(e)}), 500
+
+@app.route('/planets/bulk', methods=['POST'])
+def bulk_upsert_planets():
+    chunk_size = chunk_size_arg()
+    records = read_records()
+    try:
+        result = bulk_upsert(Planet, records, PLANET_FIELDS, chunk_size=chunk_size)
+        invalidate(Planet)
+        return jsonify(result), 200
+
     except Exception as e:
         return jsonify({"error": "Internal Server Error", "message": str(e)}), 500
 
 @app.route('/planets/<int:planet_id>', methods=['PUT'])
 def update_planet(planet_id):
+    row = update_args(PLANET_FIELDS)
     try:
-        planet = Planet.query.get(planet_id)
-        if not planet:
+        planet = update_entity(Planet, planet_id, row)
+        if planet is None:
             return jsonify({"error": "Planet not found"}), 404
 
-        data = request.get_json()
-        for key in data:
-            if hasattr(planet, key):
-                setattr(planet, key, data[key])
-
         db.session.commit()
+        invalidate(Planet, planet_id)
         return jsonify(planet.serialize()), 200
 
+    except IntegrityError as e:
+        return constraint_error(e, Planet)
     except Exception as e:
         return jsonify({"error": "Internal Server Error", "message": str(e)}), 500
 
 @app.route('/planets/<int:planet_id>', methods=['DELETE'])
 def delete_planet(planet_id):
     try:
-        planet = Planet.query.get(planet_id)
-        if not planet:
+        orphaned = clear_references(Planet, planet_id)
+        if not delete_entity(Planet, planet_id):
             return jsonify({"error": "Planet not found"}), 404
 
-        db.session.delete(planet)
         db.session.commit()
+        invalidate(Planet, planet_id)
+        for model, ids in orphaned.items():
+            for entity_id in ids:
+                invalidate(model, entity_id)
         return jsonify({"message": "Planet deleted successfully"}), 200
 
+    except IntegrityError as e:
+        return constraint_error(e, Planet)
     except Exception as e:
         return jsonify({"error": "Internal Server Error", "message": str(e)}), 500
 
 @app.route('/people', methods=['POST'])
+@idempotent
 def create_person():
+    row = create_args(PEOPLE_FIELDS, PEOPLE_COLUMNS)
     try:
-        data = request.get_json()
-
-        required_fields = ['uid', 'name', 'gender', 'skin_color', 'hair_color',
-                           'height', 'eye_color', 'mass', 'homeworld',
-                           'birth_year', 'url']
-
-        if not all(field in data for field in required_fields):
-            return jsonify({"error": "Missing required person fields"}), 400
-
-        new_person = People(
-            uid=data['uid'],
-            name=data['name'],
-            gender=data['gender'],
-            skin_color=data['skin_color'],
-            hair_color=data['hair_color'],
-            height=data['height'],
-            eye_color=data['eye_color'],
-            mass=data['mass'],
-            homeworld=data['homeworld'],
-            birth_year=data['birth_year'],
-            url=data['url']
-        )
-
-        db.session.add(new_person)
+        new_person = create_entity(People, row)
         db.session.commit()
+        invalidate(People, new_person.id)
 
         return jsonify(new_person.serialize()), 201
 
+    except IntegrityError as e:
+        return constraint_error(e, People)
+    except Exception as e:
+        return jsonify({"error": "Internal Server Error", "message": str(e)}), 500
+
+@app.route('/people/bulk', methods=['POST'])
+def bulk_upsert_people():
+    chunk_size = chunk_size_arg()
+    records = read_records()
+    try:
+        result = bulk_upsert(People, records, PEOPLE_FIELDS, PEOPLE_COLUMNS, chunk_size=chunk_size)
+        invalidate(People)
+        return jsonify(result), 200
+
     except Exception as e:
         return jsonify({"error": "Internal Server Error", "message": str(e)}), 500
 
 @app.route('/people/<int:people_id>', methods=['PUT'])
 def update_person(people_id):
+    row = update_args(PEOPLE_FIELDS, PEOPLE_COLUMNS)
     try:
-        person = People.query.get(people_id)
-        if not person:
+        person = update_entity(People, people_id, row)
+        if person is None:
             return jsonify({"error": "Person not found"}), 404
 
-        data = request.get_json()
-        for key in data:
-            if hasattr(person, key):
-                setattr(person, key, data[key])
-
         db.session.commit()
+        invalidate(People, people_id)
         return jsonify(person.serialize()), 200
 
+    except IntegrityError as e:
+        return constraint_error(e, People)
     except Exception as e:
         return jsonify({"error": "Internal Server Error", "message": str(e)}), 500
 
 @app.route('/people/<int:people_id>', methods=['DELETE'])
 def delete_person(people_id):
     try:
-        person = People.query.get(people_id)
-        if not person:
+        if not delete_entity(People, people_id):
             return jsonify({"error": "Person not found"}), 404
 
-        db.session.delete(person)
         db.session.commit()
+        invalidate(People, people_id)
         return jsonify({"message": "Character deleted successfully"}), 200
 
+    except IntegrityError as e:
+        return constraint_error(e, People)
     except Exception as e:
         return jsonify({"error": "Internal Server Error", "message": str(e)}), 500
 
@@ -296,6 +379,9 @@ def get_user_favorites(user_id):
     if not user:
         return jsonify({"error": "User not found"}), 404
 
+    if flag_arg("expand"):
+        return jsonify(expand_favorites(user.favorites)), 200
+
     return jsonify([{
         "favorite_id": f.favorite_id,
         "favorite_type": f.favorite_type
@@ -303,6 +389,7 @@ def get_user_favorites(user_id):
 
 
 @app.route('/users/<int:user_id>/favorites', methods=['POST'])
+@idempotent
 def add_favorite(user_id):
     user = db.session.get(User, user_id)
     if not user:
@@ -314,13 +401,16 @@ def add_favorite(user_id):
 
     if not favorite_id or not favorite_type:
         return jsonify({"error": "Missing favorite_id or favorite_type"}), 400
+    favorite_type = stored_favorite_type(favorite_type)
 
-    insert_stmt = favorites.insert().values(
+    insert_stmt = dialect_insert(favorites).values(
         user_id=user_id,
         favorite_id=favorite_id,
         favorite_type=favorite_type
-    )
-    db.session.execute(insert_stmt)
+    ).on_conflict_do_nothing()
+    if db.session.execute(insert_stmt).rowcount:
+        record_favorites(db.session.connection(), added=[(favorite_type, favorite_id)])
+    bump_table_versions(db.session.connection(), ["favorites"])
     db.session.commit()
     
     return jsonify({"message": "Favorite added successfully"}), 201
@@ -338,18 +428,161 @@ def delete_favorite(user_id):
 
     if not favorite_id or not favorite_type:
         return jsonify({"error": "Missing favorite_id or favorite_type"}), 400
+    favorite_type = stored_favorite_type(favorite_type)
 
     delete_stmt = favorites.delete().where(
         (favorites.c.user_id == user_id) &
         (favorites.c.favorite_id == favorite_id) &
         (favorites.c.favorite_type == favorite_type)
     )
-    db.session.execute(delete_stmt)
+    if db.session.execute(delete_stmt).rowcount:
+        record_favorites(db.session.connection(), removed=[(favorite_type, favorite_id)])
+    bump_table_versions(db.session.connection(), ["favorites"])
     db.session.commit()
 
     return jsonify({"message": "Favorite deleted successfully"}), 200
 
 
+@app.route('/search', methods=['GET'])
+def search_catalog():
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({"error": "Missing search query 'q'"}), 400
+
+    entity_type = request.args.get('type')
+    if entity_type and entity_type not in SEARCHABLE:
+        return jsonify({"error": f"type must be one of: {', '.join(SEARCHABLE)}"}), 400
+
+    try:
+        limit = min(max(int(request.args.get('limit', 10)), 1), 50)
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+
+    try:
+        return jsonify({"query": query, "results": search(query, entity_type, limit)}), 200
+
+    except Exception as e:
+        return jsonify({"error": "Internal Server Error", "message": str(e)}), 500
+
+
+#stats endpoints
+
+@app.route('/stats/planets', methods=['GET'])
+@conditional_collection("planet")
+def get_planet_stats():
+    try:
+        return jsonify(planet_stats()), 200
+    except Exception as e:
+        return jsonify({"error": "Internal Server Error", "message": str(e)}), 500
+
+@app.route('/stats/people', methods=['GET'])
+@conditional_collection("people")
+def get_people_stats():
+    top = top_arg()
+    try:
+        return jsonify(people_stats(top)), 200
+    except Exception as e:
+        return jsonify({"error": "Internal Server Error", "message": str(e)}), 500
+
+@app.route('/stats/favorites', methods=['GET'])
+@conditional_collection("favorites", "planet", "people")
+def get_favorite_stats():
+    top = top_arg()
+    kind = favorite_type_arg()
+    try:
+        return jsonify(favorite_stats(top, kind)), 200
+    except Exception as e:
+        return jsonify({"error": "Internal Server Error", "message": str(e)}), 500
+
+@app.cli.command("check-stats")
+def check_stat_counters():
+    """Compare the /stats counters with a recomputation (flask check-stats); exits 1 on differences."""
+    result = check_stats(db.session.connection())
+    db.session.rollback()
+    for mismatch in result["mismatches"]:
+        click.echo(json.dumps(mismatch, sort_keys=True))
+    click.echo(f"{result['rows']} stat counters, {len(result['mismatches'])} differ")
+    if not result["consistent"]:
+        raise SystemExit(1)
+
+@app.cli.command("rebuild-stats")
+def rebuild_stat_counters():
+    """Recompute the /stats counters from the catalog (flask rebuild-stats)."""
+    try:
+        rows = rebuild_stats(db.session.connection())
+        # /stats ETags follow these tables' versions
+        bump_table_versions(db.session.connection(), ["favorites", "people", "planet"])
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    click.echo(f"Rebuilt {rows} stat counters")
+
+
+@app.route('/_internal/cache', methods=['GET'])
+def get_cache_stats():
+    return jsonify({**catalog_cache.stats(), "compression": compression_stats(),
+                    "idempotency": idempotency_store.stats(), "single_flight": collection_flight.stats()}), 200
+
+@app.route('/_internal/pool', methods=['GET'])
+def get_pool_stats():
+    return jsonify({**pool_stats(db.engine), **replica_set.stats()}), 200
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    return render_metrics(), 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+
+
+def _favorite_items(items):
+    """Validate a list of {favorite_id, favorite_type} objects into tuples."""
+    if not isinstance(items, list):
+        raise APIException("Favorites must be a list", status_code=400)
+    result = []
+    for item in items:
+        if not isinstance(item, dict):
+            raise APIException("Each favorite must be an object", status_code=400)
+        favorite_id = item.get('favorite_id')
+        favorite_type = item.get('favorite_type')
+        if not isinstance(favorite_id, int) or favorite_type not in FAVORITE_MODELS:
+            raise APIException("Invalid favorite_id or favorite_type", status_code=400,
+                               payload={"favorite": item})
+        result.append((stored_favorite_type(favorite_type), favorite_id))
+    return result
+
+
+@app.route('/users/<int:user_id>/favorites', methods=['PUT', 'PATCH'])
+def sync_user_favorites(user_id):
+    """PUT replaces the whole set; PATCH takes {"add": [...], "remove": [...]}."""
+    data = request.get_json(silent=True)
+    if request.method == 'PUT':
+        wanted = _favorite_items(data)
+        add = remove = ()
+    else:
+        if not isinstance(data, dict):
+            raise APIException("Body must be an object with add/remove lists", status_code=400)
+        wanted = None
+        add = _favorite_items(data.get('add', []))
+        remove = _favorite_items(data.get('remove', []))
+
+    try:
+        user = db.session.get(User, user_id)
+        if not user:
+            return jsonify({"error": "User not found"}), 404
+
+        result = sync_favorites(user_id, wanted=wanted, add=add, remove=remove)
+        db.session.commit()
+
+        result["favorites"] = [
+            {"favorite_id": favorite_id, "favorite_type": favorite_type}
+            for favorite_type, favorite_id in result["favorites"]
+        ]
+        return jsonify(result), 200
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": "Internal Server Error", "message": str(e)}), 500
+
+
 # this only runs if `$ python src/app.py` is executed
 if __name__ == '__main__':
     PORT = int(os.environ.get('PORT', 3000))
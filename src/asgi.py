@@ -0,0 +1,267 @@
+"""
+ASGI entry point with async database access.
+
+    uvicorn asgi:application --app-dir src --workers 4
+
+The I/O-bound routes below run as coroutines over an AsyncSession (asyncpg
+on Postgres, aiosqlite on SQLite), so a worker keeps many requests in
+flight while they wait on the database, and a request's independent
+queries run concurrently:
+
+- GET /planets, /people, /users catalog reads: filters, sort, fields,
+  pagination, snapshots and ETags behave exactly as in app.py
+- GET/POST/DELETE /users/<id>/favorites
+
+Each request still runs inside a Flask request context, so argument
+parsing, error handlers and after_request hooks (compression, replica
+stickiness) are shared with the WSGI app. Every other route, and the ORM
+variants of the reads above (``include=``, ``stream=1``), is passed to the
+Flask app through asgiref's WsgiToAsgi and runs in its thread pool.
+"""
+import asyncio
+import re
+from asgiref.wsgi import WsgiToAsgi
+from flask import request, jsonify, make_response, g
+from sqlalchemy import select
+from app import app
+from async_db import async_session, fetch_all, fetch_scalar, fetch_scalars, dispose_engine
+from conditional import collection_validators, is_not_modified, not_modified_response, set_validators
+from filters import PEOPLE_SPEC, PLANET_SPEC, USER_SPEC, catalog_select
+from idempotency import idempotent_async
+from models import User, TableVersion, Favorite, favorites, dialect_insert, bump_table_versions, favorite_ids_by_model, serialize_expanded, stored_favorite_type
+from pagination import wants_pagination, pagination_args, count_select, page_select, page_body, order_by_keys
+from singleflight import collection_flight, flight_key
+from snapshots import wants_snapshot, current_snapshot, store_snapshot, stale_snapshot, send_snapshot
+from stats import record_favorites
+from streaming import wants_stream
+from utils import list_arg, flag_arg
+
+ROUTES = []
+
+
+def route(method, pattern, when=None):
+    """Register an async view; ``when()`` may decline a request to the WSGI app."""
+    regex = re.compile("^" + re.sub(r"<int:(\w+)>", r"(?P<\1>[0-9]+)", pattern) + "/?$")
+
+    def decorator(view):
+        ROUTES.append((method, regex, view, when))
+        return view
+    return decorator
+
+
+async def table_versions(names):
+    table = TableVersion.__table__
+    rows = await fetch_all(select(table).where(table.c.name.in_(list(names))))
+    found = {row.name: (row.version, row.updated_at) for row in rows}
+    return {name: found.get(name, (0, None)) for name in names}
+
+
+def _plain_catalog_read():
+    return not wants_stream() and not list_arg("include")
+
+
+async def catalog_view(table, spec, snapshot=False):
+    versions = await table_versions([table])
+    etag, last_modified = collection_validators([table], versions)
+    if is_not_modified(etag, last_modified):
+        return not_modified_response(etag, last_modified)
+    g.collection_versions = versions
+    g.collection_etag = etag
+
+    stmt, order, to_dict = catalog_select(spec)
+    if snapshot and wants_snapshot():
+        version = versions[table][0]
+        cached = current_snapshot(table, version)
+        if cached is None:
+            key = f"snapshot:{table}:{version}"
+            stale = stale_snapshot(table, key)
+            if stale is not None:
+                return stale
+
+            async def build_snapshot():
+                rows = await fetch_all(order_by_keys(stmt, order))
+                # encoding and compressing the full body is CPU work; keep it off the loop
+                return await asyncio.to_thread(store_snapshot, table, version,
+                                               [to_dict(row) for row in rows], last_modified)
+            cached = current_snapshot(table, version) or await collection_flight.do_async(key, build_snapshot)
+        return send_snapshot(cached)
+
+    async def build():
+        if wants_pagination():
+            page_args = pagination_args()
+            # built before any coroutine is created: a bad cursor raises here
+            page = page_select(stmt, order, page_args["limit"], page_args["after"])
+            if page_args["with_total"]:
+                rows, total = await asyncio.gather(fetch_all(page), fetch_scalar(count_select(stmt)))
+            else:
+                rows, total = await fetch_all(page), None
+            body = page_body(rows, order, to_dict, page_args["limit"], total, page_args["with_total"])
+        else:
+            body = [to_dict(row) for row in await fetch_all(order_by_keys(stmt, order))]
+        return jsonify(body).get_data()
+
+    body = await collection_flight.do_async(flight_key(), build)
+    response = make_response(body, 200)
+    response.mimetype = app.json.mimetype
+    return set_validators(response, etag, last_modified)
+
+
+@route("GET", "/planets", when=_plain_catalog_read)
+async def get_all_planets():
+    return await catalog_view("planet", PLANET_SPEC, snapshot=True)
+
+
+@route("GET", "/people", when=_plain_catalog_read)
+async def get_all_people():
+    return await catalog_view("people", PEOPLE_SPEC, snapshot=True)
+
+
+@route("GET", "/users", when=_plain_catalog_read)
+async def get_all_users():
+    return await catalog_view("user", USER_SPEC)
+
+
+#favorites endpoints
+
+def _favorite_filter(user_id):
+    return favorites.c.user_id == user_id
+
+
+@route("GET", "/users/<int:user_id>/favorites")
+async def get_user_favorites(user_id):
+    user_id_found, rows = await asyncio.gather(
+        fetch_scalar(select(User.id).where(User.id == user_id)),
+        fetch_all(select(favorites.c.favorite_id, favorites.c.favorite_type).where(_favorite_filter(user_id))),
+    )
+    if user_id_found is None:
+        return jsonify({"error": "User not found"}), 404
+
+    favs = [Favorite(row.favorite_id, row.favorite_type) for row in rows]
+    if not flag_arg("expand"):
+        return jsonify([f.serialize() for f in favs]), 200
+
+    groups = list(favorite_ids_by_model(favs).items())
+    loaded = await asyncio.gather(*[fetch_scalars(select(model).where(model.id.in_(ids))) for model, ids in groups])
+    found = {(model, row.id): row for (model, _), rows in zip(groups, loaded) for row in rows}
+    return jsonify(serialize_expanded(favs, found)), 200
+
+
+async def _write_favorite(user_id, build_stmt, change, message, status):
+    async with async_session() as session, session.begin():
+        if await session.scalar(select(User.id).where(User.id == user_id)) is None:
+            return jsonify({"error": "User not found"}), 404
+
+        data = request.get_json()
+        favorite_id = data.get('favorite_id')
+        favorite_type = data.get('favorite_type')
+        if not favorite_id or not favorite_type:
+            return jsonify({"error": "Missing favorite_id or favorite_type"}), 400
+        favorite_type = stored_favorite_type(favorite_type)
+
+        result = await session.execute(build_stmt(favorite_id, favorite_type))
+        connection = await session.connection()
+        if result.rowcount:
+            await connection.run_sync(record_favorites, **{change: [(favorite_type, favorite_id)]})
+        await connection.run_sync(bump_table_versions, ["favorites"])
+    return jsonify({"message": message}), status
+
+
+@route("POST", "/users/<int:user_id>/favorites")
+@idempotent_async
+async def add_favorite(user_id):
+    def build_stmt(favorite_id, favorite_type):
+        return dialect_insert(favorites).values(
+            user_id=user_id, favorite_id=favorite_id, favorite_type=favorite_type
+        ).on_conflict_do_nothing()
+    return await _write_favorite(user_id, build_stmt, "added", "Favorite added successfully", 201)
+
+
+@route("DELETE", "/users/<int:user_id>/favorites")
+async def delete_favorite(user_id):
+    def build_stmt(favorite_id, favorite_type):
+        return favorites.delete().where(
+            _favorite_filter(user_id) &
+            (favorites.c.favorite_id == favorite_id) &
+            (favorites.c.favorite_type == favorite_type)
+        )
+    return await _write_favorite(user_id, build_stmt, "removed", "Favorite deleted successfully", 200)
+
+
+class AsyncApp:
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        self.wsgi = WsgiToAsgi(flask_app)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            return await self._lifespan(receive, send)
+        if scope["type"] == "http":
+            for method, regex, view, when in ROUTES:
+                match = regex.match(scope["path"])
+                if match and scope["method"] == method:
+                    response = await self._serve(view, match.groupdict(), when, scope, receive)
+                    if response is not None:
+                        return await self._send(response, send)
+                    break
+        await self.wsgi(scope, receive, send)
+
+    async def _serve(self, view, params, when, scope, receive):
+        # only GET views may decline, and they never read the body, so a
+        # declined request reaches the WSGI app with ``receive`` untouched
+        body = await self._read_body(receive) if scope["method"] != "GET" else b""
+        headers = [(name.decode("latin-1"), value.decode("latin-1")) for name, value in scope["headers"]]
+        client = scope.get("client") or ("", 0)
+        with self.flask_app.test_request_context(
+            scope["path"], method=scope["method"], query_string=scope["query_string"].decode("latin-1"),
+            headers=headers, data=body, environ_base={"REMOTE_ADDR": client[0]},
+        ):
+            if when is not None and not when():
+                return None
+            return await self._dispatch(view, {name: int(value) for name, value in params.items()})
+
+    async def _dispatch(self, view, params):
+        flask_app = self.flask_app
+        try:
+            rv = flask_app.preprocess_request()
+            if rv is None:
+                rv = await view(**params)
+        except Exception as e:
+            try:
+                rv = flask_app.handle_user_exception(e)
+            except Exception as e:
+                return flask_app.handle_exception(e)
+        return flask_app.finalize_request(rv)
+
+    @staticmethod
+    async def _read_body(receive):
+        chunks = []
+        while True:
+            message = await receive()
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body"):
+                return b"".join(chunks)
+
+    @staticmethod
+    async def _send(response, send):
+        await send({
+            "type": "http.response.start",
+            "status": response.status_code,
+            "headers": [(name.lower().encode("latin-1"), value.encode("latin-1"))
+                        for name, value in response.headers.items()],
+        })
+        await send({"type": "http.response.body", "body": response.get_data()})
+        response.close()
+
+    @staticmethod
+    async def _lifespan(receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await dispose_engine()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+
+application = AsyncApp(app)
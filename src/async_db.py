@@ -0,0 +1,58 @@
+"""
+Async engine and sessions for the ASGI entry point (``asgi.py``).
+
+The async URL is derived from the app's SQLALCHEMY_DATABASE_URI by swapping
+in an asyncio driver (asyncpg for Postgres, aiosqlite for SQLite) unless
+ASYNC_DATABASE_URL is set. Pool settings are the same DB_POOL_* values
+the sync engine uses.
+"""
+import os
+from flask import current_app
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from pool import engine_options
+
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+_engine = None
+_sessionmaker = None
+
+
+def async_database_url(url):
+    scheme, sep, rest = url.partition("://")
+    return ASYNC_DRIVERS.get(scheme, scheme) + sep + rest
+
+
+def async_session():
+    """A new AsyncSession; the engine is created on first use in each worker."""
+    global _engine, _sessionmaker
+    if _sessionmaker is None:
+        url = os.getenv("ASYNC_DATABASE_URL") or async_database_url(current_app.config["SQLALCHEMY_DATABASE_URI"])
+        _engine = create_async_engine(url, **engine_options(url, asyncio=True))
+        _sessionmaker = async_sessionmaker(_engine, expire_on_commit=False)
+    return _sessionmaker()
+
+
+async def fetch_all(stmt):
+    async with async_session() as session:
+        return (await session.execute(stmt)).all()
+
+
+async def fetch_scalar(stmt):
+    async with async_session() as session:
+        return await session.scalar(stmt)
+
+
+async def fetch_scalars(stmt):
+    async with async_session() as session:
+        return (await session.scalars(stmt)).all()
+
+
+async def dispose_engine():
+    global _engine, _sessionmaker
+    if _engine is not None:
+        await _engine.dispose()
+    _engine = _sessionmaker = None
@@ -0,0 +1,169 @@
+"""
+Bulk create/upsert for catalog tables (People, Planet).
+
+The whole payload is validated first; valid records are then written with
+multi-row ``INSERT ... ON CONFLICT (uid) DO UPDATE`` statements, committed
+every ``chunk_size`` rows. Invalid records are reported back by index and
+never stop the rest of the batch: a chunk the database rejects is split in
+halves and retried until the offending records are isolated, so only they
+are reported, each with the first line of the database's message.
+"""
+import json
+import os
+from flask import request
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError, DataError
+from models import db, utcnow, bump_table_versions, dialect_insert
+from search import reindex_by_uid
+from stats import STAT_COLUMNS, record_rows
+from utils import APIException
+
+NDJSON_MIMETYPE = "application/x-ndjson"
+DEFAULT_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", 500))
+MAX_CHUNK_SIZE = 5000
+
+PLANET_FIELDS = {
+    "uid": int, "name": str, "climate": str, "diameter": int, "gravity": str,
+    "orbital_period": int, "population": int, "rotation_period": int,
+    "terrain": str, "url": str,
+}
+
+PEOPLE_FIELDS = {
+    "uid": int, "name": str, "gender": str, "skin_color": str, "hair_color": str,
+    "height": int, "eye_color": str, "mass": int, "homeworld": int,
+    "birth_year": str, "url": str,
+}
+
+# payload key -> column name, where they differ
+PEOPLE_COLUMNS = {"homeworld": "homeworld_id"}
+
+def read_records():
+    """Return the request body as a list of records (JSON array or NDJSON).
+
+    NDJSON lines that are not valid JSON are kept as ``ValueError`` items
+    so they can be reported with their index like any other bad record.
+    """
+    if request.mimetype == NDJSON_MIMETYPE:
+        records = []
+        for line in request.stream:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                records.append(json.loads(line))
+            except ValueError as e:
+                records.append(ValueError(f"Invalid JSON: {e}"))
+        return records
+
+    data = request.get_json(silent=True)
+    if not isinstance(data, list):
+        raise APIException("Body must be a JSON array or NDJSON stream of records", status_code=400)
+    return data
+
+
+def chunk_size_arg():
+    try:
+        size = int(request.args.get("chunk_size", DEFAULT_CHUNK_SIZE))
+    except ValueError:
+        raise APIException("chunk_size must be an integer", status_code=400)
+    if size < 1 or size > MAX_CHUNK_SIZE:
+        raise APIException(f"chunk_size must be between 1 and {MAX_CHUNK_SIZE}", status_code=400)
+    return size
+
+
+def validate_record(record, fields, columns=None, required=()):
+    """
+    Return ``(row, None)`` with column names as keys, or ``(None, error)``.
+    Fields in ``required`` may not be null.
+    """
+    if isinstance(record, ValueError):
+        return None, str(record)
+    if not isinstance(record, dict):
+        return None, "Record must be a JSON object"
+
+    missing = [field for field in fields if field not in record]
+    if missing:
+        return None, f"Missing fields: {', '.join(missing)}"
+
+    row = {}
+    for field, kind in fields.items():
+        value = record[field]
+        if value is None and field in required:
+            return None, f"Field '{field}' cannot be null"
+        if value is not None and (not isinstance(value, kind) or isinstance(value, bool)):
+            return None, f"Field '{field}' must be of type {kind.__name__}"
+        row[(columns or {}).get(field, field)] = value
+    return row, None
+
+
+def required_fields(model, fields, columns=None):
+    """Fields of ``fields`` stored in NOT NULL columns of ``model``."""
+    table = model.__table__
+    return {field for field in fields if not table.c[(columns or {}).get(field, field)].nullable}
+
+
+def _short_error(e):
+    """First line of the driver's message, without the statement and its parameters."""
+    message = str(getattr(e, "orig", None) or e)
+    return message.strip().splitlines()[0] if message.strip() else type(e).__name__
+
+
+def _write_chunk(model, chunk):
+    table = model.__table__
+    stmt = dialect_insert(table).values([row for _, row in chunk])
+    update_columns = {name: stmt.excluded[name] for name in chunk[0][1] if name != "uid"}
+    update_columns["version"] = table.c.version + 1
+    update_columns["updated_at"] = utcnow()
+    stmt = stmt.on_conflict_do_update(index_elements=[table.c.uid], set_=update_columns)
+    uids = [row["uid"] for _, row in chunk]
+    # values being overwritten, so the /stats counters can move them
+    replaced = db.session.execute(
+        select(*[table.c[column] for column in sorted(STAT_COLUMNS[model])])
+        .where(table.c.uid.in_(uids)).with_for_update()
+    ).mappings().all()
+    db.session.execute(stmt)
+    record_rows(db.session.connection(), model, old=replaced, new=[row for _, row in chunk])
+    reindex_by_uid(db.session.connection(), model, uids)
+    bump_table_versions(db.session.connection(), [table.name])
+    db.session.commit()
+
+
+def _write_or_split(model, chunk, errors):
+    """Write ``chunk``, bisecting it when the database rejects it; returns rows written."""
+    try:
+        _write_chunk(model, chunk)
+        return len(chunk)
+    except (IntegrityError, DataError) as e:
+        db.session.rollback()
+        if len(chunk) == 1:
+            errors.append({"index": chunk[0][0], "error": _short_error(e)})
+            return 0
+    except Exception as e:
+        db.session.rollback()
+        errors.extend({"index": index, "error": _short_error(e)} for index, _ in chunk)
+        return 0
+    middle = len(chunk) // 2
+    return _write_or_split(model, chunk[:middle], errors) + _write_or_split(model, chunk[middle:], errors)
+
+
+def bulk_upsert(model, records, fields, columns=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    errors = []
+    rows_by_uid = {}
+    required = required_fields(model, fields, columns)
+    for index, record in enumerate(records):
+        row, error = validate_record(record, fields, columns, required)
+        if error:
+            errors.append({"index": index, "error": error})
+            continue
+        if row["uid"] in rows_by_uid:
+            previous, _ = rows_by_uid[row["uid"]]
+            errors.append({"index": previous, "error": "Superseded by a later record with the same uid"})
+        rows_by_uid[row["uid"]] = (index, row)
+
+    items = sorted(rows_by_uid.values(), key=lambda item: item[0])
+    written = 0
+    for start in range(0, len(items), chunk_size):
+        written += _write_or_split(model, items[start:start + chunk_size], errors)
+
+    errors.sort(key=lambda error: error["index"])
+    return {"received": len(records), "upserted": written, "errors": errors}
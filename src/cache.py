@@ -0,0 +1,373 @@
+"""
+Read-through cache for serialized catalog entities (People, Planet).
+
+Entries hold a row's ``serialize()`` output together with its version and
+updated_at, so conditional GETs can be answered from the cache. Storage
+is delegated to a backend selected with CATALOG_CACHE_BACKEND:
+
+- ``memory`` (default): a bounded LRU with TTL, private to one process.
+- ``sqlite``: a SQLite file (CATALOG_CACHE_URL) shared by every gunicorn
+  worker on the host.
+- ``redis``: any Redis-protocol server at CATALOG_CACHE_URL, shared by
+  every worker and instance. Needs the optional ``redis`` package.
+
+Every entry records the generation counters it was loaded under, one per
+table and one per entity, and is only served while both still match; the
+entry and the two counters are read in one backend call (one MGET on
+Redis). Write handlers call ``invalidate``, which bumps the entity's
+generation after a single-row write and the table's after a bulk write, so
+entries that were cached (or are being cached by a reader racing the
+write) in any worker stop being served at once, without evicting the rest
+of the table for a one-row change.
+
+Counters expire ``2 * ttl`` after their last bump. By then every entry
+loaded under an older generation has expired too, so a counter that
+starts again from 0 cannot bring one back, and the counters stay bounded
+by the entities written within that window.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from models import db
+
+
+class CacheBackend:
+    """Interface every cache backend implements."""
+    name = "base"
+
+    def get(self, key):
+        raise NotImplementedError
+
+    def set(self, key, value):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def incr(self, key):
+        """Atomically increment the counter at ``key`` and return the new value."""
+        raise NotImplementedError
+
+    def counter(self, key):
+        raise NotImplementedError
+
+    def get_with_counters(self, key, counter_keys):
+        """``(get(key), [counter(k) for k in counter_keys])`` in one call."""
+        return self.get(key), [self.counter(counter_key) for counter_key in counter_keys]
+
+    def clear(self):
+        raise NotImplementedError
+
+    def stats(self):
+        return {"backend": self.name}
+
+
+class LRUCache(CacheBackend):
+    name = "memory"
+
+    def __init__(self, maxsize=1024, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        # key -> (value, expires_at), oldest bump first
+        self._counters = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            return self._get(key)
+
+    def _get(self, key):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def incr(self, key):
+        with self._lock:
+            now = time.monotonic()
+            value = self._counter(key, now) + 1
+            self._counters[key] = (value, now + 2 * self.ttl)
+            self._counters.move_to_end(key)
+            while self._counters:
+                _, (_, expires_at) = next(iter(self._counters.items()))
+                if expires_at >= now:
+                    break
+                self._counters.popitem(last=False)
+            return value
+
+    def _counter(self, key, now):
+        value, expires_at = self._counters.get(key, (0, now))
+        return value if expires_at >= now else 0
+
+    def counter(self, key):
+        with self._lock:
+            return self._counter(key, time.monotonic())
+
+    def get_with_counters(self, key, counter_keys):
+        with self._lock:
+            now = time.monotonic()
+            return self._get(key), [self._counter(counter_key, now) for counter_key in counter_keys]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "backend": self.name,
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "evictions": self.evictions,
+                "counters": len(self._counters),
+            }
+
+
+class SQLiteCache(CacheBackend):
+    """
+    Cache stored in a SQLite file so that all workers on a host share it.
+
+    When the table grows past ``maxsize`` the oldest inserted entries are
+    dropped, which approximates LRU without a write on every read.
+    """
+    name = "sqlite"
+
+    def __init__(self, path, maxsize=1024, ttl=300):
+        self.path = path
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache_entry "
+            "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache_generation "
+            "(key TEXT PRIMARY KEY, value INTEGER NOT NULL, expires_at REAL NOT NULL)"
+        )
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        row = self._conn().execute(
+            "SELECT value FROM cache_entry WHERE key = ? AND expires_at >= ?",
+            (key, time.time()),
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key, value):
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO cache_entry (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, json.dumps(value), time.time() + self.ttl),
+        )
+        conn.execute(
+            "DELETE FROM cache_entry WHERE expires_at < ? OR rowid IN ("
+            "SELECT rowid FROM cache_entry ORDER BY rowid DESC LIMIT -1 OFFSET ?)",
+            (time.time(), self.maxsize),
+        )
+
+    def delete(self, key):
+        self._conn().execute("DELETE FROM cache_entry WHERE key = ?", (key,))
+
+    def incr(self, key):
+        conn = self._conn()
+        now = time.time()
+        conn.execute("DELETE FROM cache_generation WHERE expires_at < ?", (now,))
+        conn.execute(
+            "INSERT INTO cache_generation (key, value, expires_at) VALUES (?, 1, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = value + 1, expires_at = excluded.expires_at",
+            (key, now + 2 * self.ttl),
+        )
+        return self.counter(key)
+
+    def counter(self, key):
+        return self.get_with_counters(None, [key])[1][0]
+
+    def get_with_counters(self, key, counter_keys):
+        now = time.time()
+        placeholders = ", ".join("?" * len(counter_keys))
+        rows = dict(self._conn().execute(
+            "SELECT key, value FROM cache_entry WHERE key = ? AND expires_at >= ? UNION ALL "
+            f"SELECT key, value FROM cache_generation WHERE key IN ({placeholders}) AND expires_at >= ?",
+            (key, now, *counter_keys, now),
+        ).fetchall())
+        value = rows.get(key)
+        return (json.loads(value) if value is not None else None,
+                [rows.get(counter_key, 0) for counter_key in counter_keys])
+
+    def clear(self):
+        self._conn().execute("DELETE FROM cache_entry")
+
+    def stats(self):
+        size = self._conn().execute("SELECT COUNT(*) FROM cache_entry").fetchone()[0]
+        return {
+            "backend": self.name,
+            "size": size,
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+        }
+
+
+class RedisCache(CacheBackend):
+    """Cache on a Redis-protocol server; size is bounded by its maxmemory policy."""
+    name = "redis"
+
+    def __init__(self, url, ttl=300, prefix="catalog:"):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("CATALOG_CACHE_BACKEND=redis requires the 'redis' package")
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key, value):
+        self.client.set(self.prefix + key, json.dumps(value), ex=max(1, int(self.ttl)))
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+    def incr(self, key):
+        pipe = self.client.pipeline()
+        pipe.incr(self.prefix + key)
+        pipe.expire(self.prefix + key, max(1, int(2 * self.ttl)))
+        return pipe.execute()[0]
+
+    def counter(self, key):
+        raw = self.client.get(self.prefix + key)
+        return int(raw) if raw is not None else 0
+
+    def get_with_counters(self, key, counter_keys):
+        raw, *counters = self.client.mget([self.prefix + key] + [self.prefix + k for k in counter_keys])
+        return (json.loads(raw) if raw is not None else None,
+                [int(value) if value is not None else 0 for value in counters])
+
+    def clear(self):
+        for key in self.client.scan_iter(self.prefix + "*"):
+            if not key.decode().startswith(self.prefix + "gen:"):
+                self.client.delete(key)
+
+    def stats(self):
+        return {"backend": self.name, "ttl": self.ttl}
+
+
+def make_backend(name=None, url=None, maxsize=None, ttl=None):
+    name = name or os.getenv("CATALOG_CACHE_BACKEND", "memory")
+    url = url or os.getenv("CATALOG_CACHE_URL")
+    maxsize = maxsize or int(os.getenv("CATALOG_CACHE_SIZE", 1024))
+    ttl = ttl or float(os.getenv("CATALOG_CACHE_TTL", 300))
+
+    if name == "memory":
+        return LRUCache(maxsize=maxsize, ttl=ttl)
+    if name == "sqlite":
+        return SQLiteCache(url or "/tmp/catalog_cache.db", maxsize=maxsize, ttl=ttl)
+    if name == "redis":
+        return RedisCache(url or "redis://localhost:6379/0", ttl=ttl)
+    raise ValueError(f"Unknown CATALOG_CACHE_BACKEND: {name}")
+
+
+class CatalogCache:
+    """Generation-versioned read-through cache on top of a backend."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, table, entity_id, load):
+        key = f"{table}:{entity_id}"
+        cached, generation = self.backend.get_with_counters(key, [f"gen:{table}", f"gen:{table}:{entity_id}"])
+        data = cached["data"] if cached is not None and cached.get("generation") == generation else None
+        with self._lock:
+            if data is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if data is None:
+            # tagged with the generation read before loading, so a write
+            # that lands during the load makes this entry stale at once
+            data = load()
+            if data is not None:
+                self.backend.set(key, {"generation": generation, "data": data})
+        return data
+
+    def invalidate(self, table, entity_id=None):
+        if entity_id is None:
+            self.backend.incr(f"gen:{table}")
+        else:
+            self.backend.incr(f"gen:{table}:{entity_id}")
+
+    def stats(self):
+        data = self.backend.stats()
+        data.update({"hits": self.hits, "misses": self.misses})
+        return data
+
+
+catalog_cache = CatalogCache(make_backend())
+
+
+def cached_entity(model, entity_id):
+    """
+    Return ``{"data", "version", "updated_at"}`` for ``entity_id``, or None
+    if it does not exist. ``data`` is the row's ``serialize()`` output.
+    Misses are loaded from the primary even on replica-routed requests.
+    """
+    def load():
+        # entries outlive the request and are shared, so they must not be
+        # filled from a lagging replica (or a row the session already read
+        # from one): read through the primary
+        row = db.session.get(model, entity_id, populate_existing=True, bind_arguments={"bind": db.engine})
+        if row is None:
+            return None
+        return {
+            "data": row.serialize(),
+            "version": row.version,
+            "updated_at": row.updated_at.isoformat() if row.updated_at else None,
+        }
+
+    return catalog_cache.get(model.__tablename__, entity_id, load)
+
+
+def invalidate(model, entity_id=None):
+    """
+    Drop the cached row ``entity_id`` of ``model``, or every cached row of
+    it when no id is given, in every worker sharing the backend.
+    """
+    catalog_cache.invalidate(model.__tablename__, entity_id)
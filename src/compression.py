@@ -0,0 +1,100 @@
+"""
+Negotiated response compression (br, gzip, deflate).
+
+``init_compression(app)`` registers an after_request hook that compresses
+JSON/text bodies of at least COMPRESS_MIN_SIZE bytes with the best coding
+the client accepts. Streaming responses and bodies that already carry a
+Content-Encoding (e.g. pre-compressed snapshots) are left alone.
+
+Compressed variants of responses with a strong ETag are cached by
+``(path, query string, etag, encoding)``, so repeated GETs of an unchanged
+entity or collection are compressed only once per worker. The URL is part
+of the key because collection ETags are only unique per URL.
+"""
+import gzip
+import os
+import zlib
+from flask import request
+from cache import LRUCache
+from conditional import ENCODING_ETAG_SUFFIXES
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+COMPRESS_LEVEL = int(os.getenv("COMPRESS_LEVEL", 6))
+COMPRESS_BROTLI_QUALITY = int(os.getenv("COMPRESS_BROTLI_QUALITY", 5))
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", 1024))
+COMPRESSIBLE_MIMETYPES = {"application/json", "application/javascript", "application/xml"}
+
+ENCODINGS = ("br", "gzip", "deflate") if brotli is not None else ("gzip", "deflate")
+
+_variants = LRUCache(
+    maxsize=int(os.getenv("COMPRESS_CACHE_SIZE", 256)),
+    ttl=float(os.getenv("COMPRESS_CACHE_TTL", 600)),
+)
+
+
+def compress_body(body, encoding):
+    if encoding == "br":
+        return brotli.compress(body, quality=COMPRESS_BROTLI_QUALITY)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=COMPRESS_LEVEL, mtime=0)
+    if encoding == "deflate":
+        return zlib.compress(body, COMPRESS_LEVEL)
+    raise ValueError(f"Unsupported encoding: {encoding}")
+
+
+def choose_encoding(available=ENCODINGS):
+    """Pick the best content coding the client accepts out of ``available``."""
+    for encoding in ENCODINGS:
+        if encoding in available and request.accept_encodings[encoding] > 0:
+            return encoding
+    return "identity"
+
+
+def _compressible(response):
+    if response.status_code < 200 or response.status_code in (204, 206, 304):
+        return False
+    if response.direct_passthrough or response.is_streamed:
+        return False
+    if "Content-Encoding" in response.headers:
+        return False
+    mimetype = response.mimetype or ""
+    return mimetype.startswith("text/") or mimetype in COMPRESSIBLE_MIMETYPES
+
+
+def compress_response(response):
+    if request.method == "HEAD" or not _compressible(response):
+        return response
+    response.vary.add("Accept-Encoding")
+
+    body = response.get_data()
+    if len(body) < COMPRESS_MIN_SIZE:
+        return response
+    encoding = choose_encoding()
+    if encoding == "identity":
+        return response
+
+    etag, weak = response.get_etag()
+    key = f"{request.path}?{request.query_string.decode('latin-1')}|{etag}|{encoding}" if etag and not weak else None
+    compressed = _variants.get(key) if key else None
+    if compressed is None:
+        compressed = compress_body(body, encoding)
+        if key:
+            _variants.set(key, compressed)
+
+    response.set_data(compressed)
+    response.headers["Content-Encoding"] = encoding
+    if etag:
+        response.set_etag(etag + ENCODING_ETAG_SUFFIXES[encoding], weak)
+    return response
+
+
+def compression_stats():
+    return _variants.stats()
+
+
+def init_compression(app):
+    app.after_request(compress_response)
@@ -0,0 +1,118 @@
+"""
+HTTP conditional request support (ETag / Last-Modified / 304).
+
+Validators are computed from version markers, never from the response
+body: collections use the per-table row in ``table_version`` and single
+entities use the row's own ``version`` column. That lets a matching
+If-None-Match be answered before any row is loaded or serialized.
+"""
+import hashlib
+from datetime import datetime, timezone
+from functools import wraps
+from flask import request, make_response, jsonify, g
+from models import table_versions
+
+
+def _as_utc(value):
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def _variant():
+    """Different query strings / Accept headers are different representations."""
+    raw = request.query_string + b"|" + request.headers.get("Accept", "").encode()
+    return hashlib.sha1(raw).hexdigest()[:12]
+
+
+# content-coded variants of a representation carry their own strong ETag
+ENCODING_ETAG_SUFFIXES = {"gzip": "-gzip", "br": "-br", "deflate": "-deflate"}
+
+
+def matched_etag(etag):
+    """The ETag (plain or content-coded variant) the client already holds, if any."""
+    for suffix in ("",) + tuple(ENCODING_ETAG_SUFFIXES.values()):
+        if request.if_none_match.contains(etag + suffix):
+            return etag + suffix
+    return None
+
+
+def is_not_modified(etag, last_modified=None):
+    if request.if_none_match:
+        return matched_etag(etag) is not None
+    if last_modified is not None and request.if_modified_since is not None:
+        return last_modified.replace(microsecond=0) <= request.if_modified_since
+    return False
+
+
+def not_modified_response(etag, last_modified=None):
+    response = make_response("", 304)
+    return set_validators(response, matched_etag(etag) or etag, last_modified)
+
+
+def set_validators(response, etag, last_modified=None):
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    return response
+
+
+def collection_validators(names, versions):
+    """ETag and Last-Modified of a collection built from ``names``'s table versions."""
+    marker = "-".join(f"{name}.{versions[name][0]}" for name in names)
+    stamps = [_as_utc(updated_at) for _, updated_at in versions.values() if updated_at]
+    return f"{marker}-{_variant()}", max(stamps) if stamps else None
+
+
+def conditional_collection(*tables, depends_on=None):
+    """
+    Decorate a collection GET view with ETag / Last-Modified handling.
+
+    ``tables`` are the tables whose contents end up in the response;
+    ``depends_on`` may be a callable returning extra table names for the
+    current request (e.g. "favorites" when ?include=favorites is used).
+    The versions and ETag are left on ``g`` for the view; a view that sets
+    its own ETag or Last-Modified (e.g. for a compressed variant, or an
+    older snapshot) keeps it.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            names = list(tables) + list(depends_on() if depends_on else [])
+            versions = table_versions(names)
+            etag, last_modified = collection_validators(names, versions)
+
+            if is_not_modified(etag, last_modified):
+                return not_modified_response(etag, last_modified)
+
+            g.collection_versions = versions
+            g.collection_etag = etag
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200:
+                set_validators(response, response.get_etag()[0] or etag,
+                               response.last_modified or last_modified)
+            return response
+        return wrapper
+    return decorator
+
+
+def entity_response(table, entity_id, entry, embed=None):
+    """
+    Answer a single-entity GET from a cache entry built by ``cached_entity``.
+
+    ``embed`` maps extra response keys to ``(table, id, entry)`` of related
+    rows (entry may be None); their versions are folded into the ETag.
+    """
+    parts = [(table, entity_id, entry)] + list((embed or {}).values())
+    etag = "+".join(f"{t}-{i}-v{e['version']}" for t, i, e in parts if e is not None)
+    stamps = [_as_utc(datetime.fromisoformat(e["updated_at"])) for _, _, e in parts if e and e["updated_at"]]
+    last_modified = max(stamps) if stamps else None
+    if is_not_modified(etag, last_modified):
+        return not_modified_response(etag, last_modified)
+
+    data = dict(entry["data"])
+    for key, (_, _, related) in (embed or {}).items():
+        data[key] = related["data"] if related is not None else None
+    return set_validators(make_response(jsonify(data), 200), etag, last_modified)
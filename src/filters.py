@@ -0,0 +1,169 @@
+"""
+Server-side filtering, sorting and sparse fieldsets for catalog collections.
+
+    GET /planets?climate=arid&population__gt=1000000&sort=-population&fields=name,uid
+
+- ``<field>=v`` and ``<field>__{ne,gt,gte,lt,lte,in}=v`` filter on
+  indexed columns (``__in`` takes a comma separated list).
+- ``sort=a,-b`` orders by indexed columns; ``id`` is always appended as
+  the tie breaker so keyset pagination stays stable.
+- ``fields=a,b`` selects only those columns from the database.
+
+The same Core select with no params is also the fast path for plain list
+requests: rows come back as tuples and are zipped with the precomputed
+field names instead of materializing ORM instances and calling
+``serialize()`` on each.
+
+Only columns listed in a model's spec are accepted, and each of them has
+an index, so every query is an index scan rather than a full table scan.
+Any other param that is not reserved (limit, cursor, count, sort, fields,
+include, stream) is answered with 400 rather than ignored.
+"""
+from flask import request
+from sqlalchemy import Integer, select
+from models import db, People, Planet, User
+from utils import APIException, list_arg
+from pagination import paginate_select, order_by_keys
+
+OPERATORS = {
+    "eq": lambda column, value: column == value,
+    "ne": lambda column, value: column != value,
+    "gt": lambda column, value: column > value,
+    "gte": lambda column, value: column >= value,
+    "lt": lambda column, value: column < value,
+    "lte": lambda column, value: column <= value,
+    "in": lambda column, value: column.in_(value),
+}
+
+
+class CatalogSpec:
+    def __init__(self, model, fields, indexed):
+        self.model = model
+        # API field name -> column, in serialize() order
+        self.fields = {name: getattr(model, attr) for name, attr in fields.items()}
+        self.indexed = set(indexed)
+
+    def column(self, name):
+        return self.fields[name]
+
+
+PEOPLE_SPEC = CatalogSpec(People, {
+    "id": "id", "uid": "uid", "name": "name", "gender": "gender",
+    "skin_color": "skin_color", "hair_color": "hair_color", "height": "height",
+    "eye_color": "eye_color", "mass": "mass", "homeworld": "homeworld_id",
+    "birth_year": "birth_year", "url": "url",
+}, indexed=["id", "uid", "name", "gender", "homeworld", "height", "mass"])
+
+PLANET_SPEC = CatalogSpec(Planet, {
+    "id": "id", "uid": "uid", "name": "name", "climate": "climate",
+    "diameter": "diameter", "gravity": "gravity", "orbital_period": "orbital_period",
+    "population": "population", "rotation_period": "rotation_period",
+    "terrain": "terrain", "url": "url",
+}, indexed=["id", "uid", "name", "climate", "terrain", "population", "diameter"])
+
+USER_SPEC = CatalogSpec(User, {
+    "id": "id", "username": "username", "email": "email",
+}, indexed=["id", "username", "email"])
+
+
+# collection params that are not filters
+RESERVED_ARGS = {"limit", "cursor", "count", "sort", "fields", "include", "stream"}
+
+
+def _cast(column, raw):
+    if isinstance(column.type, Integer):
+        try:
+            return int(raw)
+        except ValueError:
+            raise APIException(f"'{column.key}' expects an integer, got '{raw}'", status_code=400)
+    return raw
+
+
+def filter_args(spec):
+    """
+    Return the WHERE clauses for the filter params present on the request.
+    Any param that is neither reserved nor an indexed field is a 400, so a
+    typo cannot silently return the unfiltered collection.
+    """
+    clauses = []
+    for arg, raw in request.args.items(multi=True):
+        if arg in RESERVED_ARGS:
+            continue
+        name, _, op = arg.partition("__")
+        if name not in spec.indexed:
+            raise APIException(f"Cannot filter by '{name}'", status_code=400,
+                               payload={"filterable": sorted(spec.indexed)})
+        op = op or "eq"
+        if op not in OPERATORS:
+            raise APIException(f"Unknown filter operator '{op}'", status_code=400)
+        column = spec.column(name)
+        if op == "in":
+            value = [_cast(column, item) for item in raw.split(",") if item]
+        else:
+            value = _cast(column, raw)
+        clauses.append(OPERATORS[op](column, value))
+    return clauses
+
+
+def sort_args(spec):
+    """Return ``[(field, descending), ...]`` ending with the primary key."""
+    order = []
+    for item in request.args.get("sort", "").split(","):
+        item = item.strip()
+        if not item:
+            continue
+        descending = item.startswith("-")
+        name = item.lstrip("-")
+        if name not in spec.indexed:
+            raise APIException(f"Cannot sort by '{name}'", status_code=400,
+                               payload={"sortable": sorted(spec.indexed)})
+        order.append((name, descending))
+    if "id" not in [name for name, _ in order]:
+        order.append(("id", False))
+    return order
+
+
+def field_args(spec):
+    names = list_arg("fields")
+    unknown = names - set(spec.fields)
+    if unknown:
+        raise APIException(f"Unknown fields: {', '.join(sorted(unknown))}", status_code=400)
+    # keep serialize() order for a stable response shape
+    return [name for name in spec.fields if name in names] or list(spec.fields)
+
+
+def wants_query(spec):
+    if "sort" in request.args or "fields" in request.args:
+        return True
+    # unknown params too, so filter_args can reject them
+    return any(arg not in RESERVED_ARGS for arg in request.args)
+
+
+def catalog_select(spec):
+    """
+    Build the Core select for the current request.
+
+    Returns ``(stmt, order, to_dict)``: only the requested columns (plus
+    the sort keys needed for cursors) are selected, and ``to_dict`` maps a
+    result row to the requested fields only.
+    """
+    names = field_args(spec)
+    order = sort_args(spec)
+
+    needed = list(dict.fromkeys(names + [name for name, _ in order]))
+    stmt = select(*[spec.column(name) for name in needed]).where(*filter_args(spec))
+    order = [(spec.column(name), descending) for name, descending in order]
+
+    # the requested fields come first in the select list, so zip() stops
+    # before any extra sort-only columns
+    def to_dict(row, names=tuple(names)):
+        return dict(zip(names, row))
+
+    return stmt, order, to_dict
+
+
+def list_catalog(stmt, order, to_dict, page_args=None):
+    """Run a ``catalog_select`` result as a keyset page or as a plain list."""
+    if page_args:
+        return paginate_select(stmt, order, to_dict, **page_args)
+    return [to_dict(row) for row in db.session.execute(order_by_keys(stmt, order))]
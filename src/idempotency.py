@@ -0,0 +1,208 @@
+"""
+Idempotency-Key support for POST endpoints.
+
+A client that retries a POST sends the same ``Idempotency-Key`` header each
+time. The first request runs the view and its response is stored under the
+key; later requests with that key get the stored response back, with an
+``Idempotent-Replayed: true`` header, before the view (or the database) is
+touched. Requests carrying a key that is still being processed in this
+worker wait for it and are answered from its result, so only one of them
+executes.
+
+A key reused with a different method, path or body is answered with 422.
+Only responses below 500 are stored: after a server error or an exception
+the key is released and a retry runs the view again.
+
+    IDEMPOTENCY_BACKEND   memory (default, per worker), sqlite or redis
+    IDEMPOTENCY_URL       SQLite file or Redis URL for the shared backends
+    IDEMPOTENCY_SIZE      keys kept by the memory/sqlite backends (default 10000)
+    IDEMPOTENCY_TTL       seconds a stored response is replayed (default 86400)
+    IDEMPOTENCY_WAIT      seconds a duplicate waits for the in-flight request
+                          before getting a 409 (default 10)
+
+With a shared backend replays work across workers and instances, but
+coalescing of concurrent duplicates is per worker; two copies arriving at
+different workers at the same moment both run, and the database's
+constraints decide the second one's outcome.
+"""
+import asyncio
+import hashlib
+import os
+import threading
+import time
+from functools import wraps
+from flask import request, jsonify, make_response
+from cache import LRUCache, SQLiteCache, RedisCache
+
+HEADER = "Idempotency-Key"
+MAX_KEY_LENGTH = 255
+STORED_HEADERS = ("Content-Type", "Location")
+
+
+def make_store_backend(name=None, url=None, maxsize=None, ttl=None):
+    name = name or os.getenv("IDEMPOTENCY_BACKEND", "memory")
+    url = url or os.getenv("IDEMPOTENCY_URL")
+    maxsize = maxsize or int(os.getenv("IDEMPOTENCY_SIZE", 10_000))
+    ttl = ttl or float(os.getenv("IDEMPOTENCY_TTL", 86_400))
+
+    if name == "memory":
+        return LRUCache(maxsize=maxsize, ttl=ttl)
+    if name == "sqlite":
+        return SQLiteCache(url or "/tmp/idempotency.db", maxsize=maxsize, ttl=ttl)
+    if name == "redis":
+        return RedisCache(url or "redis://localhost:6379/0", ttl=ttl, prefix="idempotency:")
+    raise ValueError(f"Unknown IDEMPOTENCY_BACKEND: {name}")
+
+
+class IdempotencyStore:
+    """Stored responses by key, plus the keys currently being processed."""
+
+    def __init__(self, backend, wait=10):
+        self.backend = backend
+        self.wait = wait
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.executions = 0
+        self.replays = 0
+        self.coalesced = 0
+
+    def claim(self, key):
+        """
+        Return ``(entry, event)``: a stored entry to replay, or an event to
+        wait on while another request holds the key, or ``(None, None)``
+        when the caller now holds the key and must ``release`` it.
+        """
+        entry = self.backend.get(key)
+        if entry is not None:
+            return entry, None
+        with self._lock:
+            event = self._inflight.get(key)
+            if event is not None:
+                return None, event
+            # the holder may have stored its response and released the key
+            # between the lookup above and taking the lock
+            entry = self.backend.get(key)
+            if entry is not None:
+                return entry, None
+            self._inflight[key] = threading.Event()
+            self.executions += 1
+            return None, None
+
+    def release(self, key, entry=None):
+        if entry is not None:
+            self.backend.set(key, entry)
+        with self._lock:
+            event = self._inflight.pop(key)
+        event.set()
+
+    def count(self, outcome):
+        with self._lock:
+            setattr(self, outcome, getattr(self, outcome) + 1)
+
+    def stats(self):
+        with self._lock:
+            counts = {"executions": self.executions, "replays": self.replays,
+                      "coalesced": self.coalesced, "in_flight": len(self._inflight)}
+        return {**self.backend.stats(), **counts}
+
+
+idempotency_store = IdempotencyStore(make_store_backend(), wait=float(os.getenv("IDEMPOTENCY_WAIT", 10)))
+
+
+def _request_key():
+    key = request.headers.get(HEADER)
+    if key is not None and not 0 < len(key) <= MAX_KEY_LENGTH:
+        return None, (jsonify({"error": f"{HEADER} must be 1 to {MAX_KEY_LENGTH} characters"}), 400)
+    return key, None
+
+
+def _fingerprint():
+    digest = hashlib.sha256(f"{request.method} {request.full_path}\n".encode())
+    digest.update(request.get_data())
+    return digest.hexdigest()
+
+
+def _entry(response, fingerprint):
+    if response.status_code >= 500:
+        return None
+    return {
+        "fingerprint": fingerprint,
+        "status": response.status_code,
+        "headers": {name: response.headers[name] for name in STORED_HEADERS if name in response.headers},
+        "body": response.get_data(as_text=True),
+    }
+
+
+def _replay(entry, fingerprint):
+    if entry["fingerprint"] != fingerprint:
+        return jsonify({"error": f"{HEADER} was already used for a different request"}), 422
+    response = make_response(entry["body"], entry["status"])
+    response.headers.update(entry["headers"])
+    response.headers["Idempotent-Replayed"] = "true"
+    return response
+
+
+def _in_progress():
+    return jsonify({"error": f"A request with this {HEADER} is still in progress"}), 409
+
+
+def idempotent(view):
+    """Decorate a POST view so requests with an Idempotency-Key run once."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key, error = _request_key()
+        if key is None:
+            return error or view(*args, **kwargs)
+        fingerprint = _fingerprint()
+        deadline = time.monotonic() + idempotency_store.wait
+
+        while True:
+            entry, event = idempotency_store.claim(key)
+            if entry is not None:
+                idempotency_store.count("replays")
+                return _replay(entry, fingerprint)
+            if event is None:
+                break
+            idempotency_store.count("coalesced")
+            if not event.wait(max(0, deadline - time.monotonic())):
+                return _in_progress()
+
+        entry = None
+        try:
+            response = make_response(view(*args, **kwargs))
+            entry = _entry(response, fingerprint)
+            return response
+        finally:
+            idempotency_store.release(key, entry)
+    return wrapper
+
+
+def idempotent_async(view):
+    """``idempotent`` for the coroutine views of the ASGI app."""
+    @wraps(view)
+    async def wrapper(*args, **kwargs):
+        key, error = _request_key()
+        if key is None:
+            return error or await view(*args, **kwargs)
+        fingerprint = _fingerprint()
+        deadline = time.monotonic() + idempotency_store.wait
+
+        while True:
+            entry, event = idempotency_store.claim(key)
+            if entry is not None:
+                idempotency_store.count("replays")
+                return _replay(entry, fingerprint)
+            if event is None:
+                break
+            idempotency_store.count("coalesced")
+            if not await asyncio.to_thread(event.wait, max(0, deadline - time.monotonic())):
+                return _in_progress()
+
+        entry = None
+        try:
+            response = make_response(await view(*args, **kwargs))
+            entry = _entry(response, fingerprint)
+            return response
+        finally:
+            idempotency_store.release(key, entry)
+    return wrapper
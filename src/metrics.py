@@ -0,0 +1,183 @@
+"""
+Request timing, SQL statement counts and a slow-query log.
+
+``init_metrics(app)`` times every request and, through engine events on
+every SQLAlchemy Engine (primary, replicas and the async engine), counts
+the statements it runs and the time spent in them. Each response gets a
+``Server-Timing`` header:
+
+    Server-Timing: app;dur=12.41, db;dur=3.05;desc="4 statements"
+
+Statements slower than SLOW_QUERY_MS are logged on the ``slow_query``
+logger with the route that ran them. Per-route latency, DB time and
+statement count histograms are served in the Prometheus text format at
+GET /metrics. Like the caches, metrics are per worker process; Prometheus
+should scrape each worker or aggregate over them.
+
+    SLOW_QUERY_MS     log statements slower than this (default 200)
+    SERVER_TIMING     0 = do not send the Server-Timing header
+"""
+import logging
+import os
+import threading
+import time
+from flask import g, request, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", 200))
+SERVER_TIMING = os.getenv("SERVER_TIMING", "1").lower() not in ("0", "false", "no")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+slow_query_log = logging.getLogger("slow_query")
+
+
+class Histogram:
+    def __init__(self, name, help, buckets, labels):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self.labels = labels
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted(self._series.items())
+        for label_values, (counts, total, count) in items:
+            labels = _labels(self.labels, label_values)
+            for bound, bucket_count in zip(self.buckets, counts):
+                lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} {bucket_count}')
+            lines.append(f'{self.name}_bucket{{{labels},le="+Inf"}} {count}')
+            lines.append(f"{self.name}_sum{{{labels}}} {total}")
+            lines.append(f"{self.name}_count{{{labels}}} {count}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help, labels):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        lines.extend(f"{self.name}{{{_labels(self.labels, values)}}} {value}" for values, value in items)
+        return lines
+
+
+def _labels(names, values):
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+REQUESTS = Counter("http_requests_total", "Requests by route and status.", ("method", "route", "status"))
+LATENCY = Histogram("http_request_duration_seconds", "Time spent handling a request.",
+                    LATENCY_BUCKETS, ("method", "route"))
+DB_TIME = Histogram("db_time_seconds", "Time a request spent in SQL statements.",
+                    LATENCY_BUCKETS, ("method", "route"))
+STATEMENTS = Histogram("db_statements_per_request", "SQL statements run by one request.",
+                       STATEMENT_BUCKETS, ("method", "route"))
+SLOW_STATEMENTS = Counter("db_slow_statements_total", f"Statements slower than {SLOW_QUERY_MS:g} ms.", ("route",))
+
+ALL_METRICS = (REQUESTS, LATENCY, DB_TIME, STATEMENTS, SLOW_STATEMENTS)
+
+
+def _route():
+    rule = request.url_rule
+    return rule.rule if rule is not None else "unmatched"
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    _statement_done(conn, statement)
+
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(context):
+    # a failed statement (e.g. a constraint violation) gets no
+    # after_cursor_execute; count it and unwind its start time here
+    conn = context.connection
+    if conn is not None and conn.info.get("query_start") and context.execution_context is not None:
+        _statement_done(conn, context.statement)
+
+
+def _statement_done(conn, statement):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    in_request = has_request_context()
+    if in_request and "request_started" in g:
+        g.db_statements += 1
+        g.db_time += elapsed
+
+    if elapsed * 1000 >= SLOW_QUERY_MS:
+        route = _route() if in_request else "-"
+        SLOW_STATEMENTS.inc(route)
+        slow_query_log.warning("%.1f ms %s %s: %s", elapsed * 1000,
+                               request.method if in_request else "-", route, " ".join(statement.split()))
+
+
+def _start_timer():
+    g.request_started = time.perf_counter()
+    g.db_statements = 0
+    g.db_time = 0.0
+
+
+def _record(response):
+    if "request_started" not in g:
+        return response
+    elapsed = time.perf_counter() - g.request_started
+    route = _route()
+    REQUESTS.inc(request.method, route, response.status_code)
+    LATENCY.observe(elapsed, request.method, route)
+    DB_TIME.observe(g.db_time, request.method, route)
+    STATEMENTS.observe(g.db_statements, request.method, route)
+    if SERVER_TIMING:
+        response.headers["Server-Timing"] = (
+            f'app;dur={elapsed * 1000:.2f}, '
+            f'db;dur={g.db_time * 1000:.2f};desc="{g.db_statements} statements"'
+        )
+    return response
+
+
+def render_metrics():
+    lines = []
+    for metric in ALL_METRICS:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def init_metrics(app):
+    """Register the timing hooks; call before other after_request hooks so
+    the recorded time includes them (Flask runs after_request in reverse)."""
+    app.before_request(_start_timer)
+    app.after_request(_record)
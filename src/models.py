@@ -1,14 +1,44 @@
+from datetime import datetime, timezone
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import String, Boolean, Integer, ForeignKey, Table, Column 
-from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy import String, Boolean, Integer, BigInteger, DateTime, ForeignKey, Table, Column, Index, select, insert, update, delete, event, literal_column, tuple_
+from sqlalchemy.orm import Mapped, mapped_column, relationship, Session
+from sqlalchemy.dialects import postgresql, sqlite
+from replicas import RoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={"class_": RoutingSession})
+
+
+def dialect_insert(table, bind=None):
+    """INSERT construct for the bound dialect, with ON CONFLICT support."""
+    dialect = (bind if bind is not None else db.session.get_bind()).dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert(table)
+    if dialect == "sqlite":
+        return sqlite.insert(table)
+    raise NotImplementedError(f"ON CONFLICT is not supported on {dialect}")
+
+
+def utcnow():
+    return datetime.now(timezone.utc)
+
+
+def version_column():
+    # bumped by the database on every UPDATE, ORM or Core
+    return mapped_column(Integer, nullable=False, default=1, server_default="1",
+                         onupdate=literal_column("version + 1"))
+
+
+def updated_at_column():
+    return mapped_column(DateTime(timezone=True), nullable=False, default=utcnow,
+                         server_default=db.func.now(), onupdate=utcnow)
 
 #table for relationships M <-> M
 favorites = Table('favorites', db.Model.metadata,
     Column('user_id', Integer, ForeignKey('user.id'), primary_key=True),
-    Column('favorite_id', Integer, nullable=False),
-    Column('favorite_type', String(20), nullable=False)  # "planet" or "character"
+    Column('favorite_type', String(20), primary_key=True),  # "planet" or "character"
+    Column('favorite_id', Integer, primary_key=True),
+    # "who favorited X" lookups and counts are answered from this index alone
+    Index('ix_favorites_type_id', 'favorite_type', 'favorite_id'),
 )
 
 class Favorite:
@@ -19,14 +49,42 @@ class Favorite:
     def __repr__(self):
         return f"<Favorite {self.favorite_type}:{self.favorite_id}>"
 
+    def serialize(self):
+        return {
+            "favorite_id": self.favorite_id,
+            "favorite_type": self.favorite_type,
+        }
+
+
+def load_favorites(users):
+    """Fetch favorites for many users with a single IN query and attach them.
+
+    After this runs, ``user.favorites`` is served from memory for every user
+    passed in instead of issuing one query per user.
+    """
+    by_user = {user.id: [] for user in users}
+    if by_user:
+        result = db.session.execute(
+            select(favorites).where(favorites.c.user_id.in_(list(by_user)))
+        )
+        for row in result:
+            by_user[row.user_id].append(Favorite(row.favorite_id, row.favorite_type))
+    for user in users:
+        user._loaded_favorites = by_user[user.id]
+    return users
+
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
+    version: Mapped[int] = version_column()
+    updated_at: Mapped[datetime] = updated_at_column()
 
     @property
     def favorites(self):
-        from sqlalchemy import select
+        loaded = self.__dict__.get("_loaded_favorites")
+        if loaded is not None:
+            return loaded
         result = db.session.execute(
             select(favorites).where(favorites.c.user_id == self.id)
         )
@@ -41,20 +99,27 @@ class User(db.Model):
             # do not serialize the password, it's a security breach
         }
 
+    def serialize_with_favorites(self):
+        data = self.serialize()
+        data["favorites"] = [f.serialize() for f in self.favorites]
+        return data
+
 
 
 class Planet(db.Model):
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     uid: Mapped[int] = mapped_column(Integer, unique=True, nullable=False)
-    name: Mapped[str] = mapped_column(String(100), nullable=False)
-    climate: Mapped[str] = mapped_column(String(100))
-    diameter: Mapped[int] = mapped_column(Integer)
+    name: Mapped[str] = mapped_column(String(100), nullable=False, index=True)
+    climate: Mapped[str] = mapped_column(String(100), index=True)
+    diameter: Mapped[int] = mapped_column(Integer, index=True)
     gravity: Mapped[str] = mapped_column(String(100))
     orbital_period: Mapped[int] = mapped_column(Integer)
-    population: Mapped[int] = mapped_column(Integer)
+    population: Mapped[int] = mapped_column(Integer, index=True)
     rotation_period: Mapped[int] = mapped_column(Integer)
-    terrain: Mapped[str] = mapped_column(String(100))
+    terrain: Mapped[str] = mapped_column(String(100), index=True)
     url: Mapped[str] = mapped_column(String(200), nullable=False)
+    version: Mapped[int] = version_column()
+    updated_at: Mapped[datetime] = updated_at_column()
 
     def serialize(self):
         return {
@@ -74,16 +139,18 @@ class Planet(db.Model):
 class People(db.Model):
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     uid: Mapped[int] = mapped_column(Integer, unique=True, nullable=False)
-    name: Mapped[str] = mapped_column(String(100), nullable=False)
-    gender: Mapped[str] = mapped_column(String(20))
+    name: Mapped[str] = mapped_column(String(100), nullable=False, index=True)
+    gender: Mapped[str] = mapped_column(String(20), index=True)
     skin_color: Mapped[str] = mapped_column(String(50))
     hair_color: Mapped[str] = mapped_column(String(50))
-    height: Mapped[int] = mapped_column(Integer)
+    height: Mapped[int] = mapped_column(Integer, index=True)
     eye_color: Mapped[str] = mapped_column(String(50))
-    mass: Mapped[int] = mapped_column(Integer)
-    homeworld_id: Mapped[int] = mapped_column(Integer, ForeignKey('planet.id'), nullable=True)
+    mass: Mapped[int] = mapped_column(Integer, index=True)
+    homeworld_id: Mapped[int] = mapped_column(Integer, ForeignKey('planet.id'), nullable=True, index=True)
     birth_year: Mapped[str] = mapped_column(String(20))
     url: Mapped[str] = mapped_column(String(200), nullable=False)
+    version: Mapped[int] = version_column()
+    updated_at: Mapped[datetime] = updated_at_column()
     #relationships
     homeworld: Mapped["Planet"] = relationship("Planet", backref="inhabitants")
 
@@ -102,3 +169,212 @@ class People(db.Model):
             "birth_year": self.birth_year,
             "url": self.url,
         }
+
+    def serialize_with_homeworld(self):
+        # load with selectinload(People.homeworld) to avoid one query per row
+        data = self.serialize()
+        data["homeworld_planet"] = self.homeworld.serialize() if self.homeworld else None
+        return data
+
+
+def attach_homeworlds(items):
+    """Add "homeworld_planet" to serialized people dicts with one IN query."""
+    ids = {item["homeworld"] for item in items if item.get("homeworld") is not None}
+    planets = {}
+    if ids:
+        planets = {planet.id: planet.serialize()
+                   for planet in db.session.scalars(select(Planet).where(Planet.id.in_(ids)))}
+    for item in items:
+        if "homeworld" in item:
+            item["homeworld_planet"] = planets.get(item["homeworld"])
+    return items
+
+
+class TableVersion(db.Model):
+    """One row per table, bumped in the same transaction as every write to it.
+
+    Collection ETags and Last-Modified headers are derived from this row so
+    that conditional GETs are answered without reading the table itself.
+    """
+    __tablename__ = "table_version"
+    name: Mapped[str] = mapped_column(String(50), primary_key=True)
+    version: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, default=utcnow,
+                                                 server_default=db.func.now())
+
+
+# One row per (term, entity): the lowercased full name plus each word of it.
+# Prefix searches are B-tree range scans on the primary key. Terms use the
+# "C" collation on Postgres so byte order matches the range bounds.
+search_terms = Table('search_terms', db.Model.metadata,
+    Column('term', String(100).with_variant(String(100, collation="C"), "postgresql"), primary_key=True),
+    Column('entity_type', String(20), primary_key=True),
+    Column('entity_id', Integer, primary_key=True),
+    Column('position', Integer, nullable=False),  # 0 = full name, n = n-th word
+    Column('name', String(100), nullable=False),
+    Index('ix_search_terms_entity', 'entity_type', 'entity_id'),
+)
+
+
+# Running aggregates behind /stats: one row per (stat, key), e.g.
+# ("planet_climate", "arid") holds the number of arid planets and the sum of
+# their population. Kept up to date by stats.py next to every write.
+stat_counters = Table('stat_counters', db.Model.metadata,
+    Column('stat', String(30), primary_key=True),
+    Column('key', String(120), primary_key=True),
+    Column('count', BigInteger, nullable=False, server_default="0"),
+    Column('total', BigInteger, nullable=False, server_default="0"),
+    # "top N" reads are a backward range scan per stat
+    Index('ix_stat_counters_stat_count', 'stat', 'count'),
+)
+
+
+def bump_table_versions(connection, names):
+    """Increment the version of every table in ``names`` with one upsert."""
+    table = TableVersion.__table__
+    now = utcnow()
+    if not names:
+        return
+    try:
+        stmt = dialect_insert(table, connection)
+    except NotImplementedError:
+        for name in names:
+            result = connection.execute(
+                update(table).where(table.c.name == name)
+                .values(version=table.c.version + 1, updated_at=now)
+            )
+            if result.rowcount == 0:
+                connection.execute(insert(table).values(name=name, version=1, updated_at=now))
+        return
+    stmt = stmt.values([{"name": name, "version": 1, "updated_at": now} for name in names])
+    connection.execute(stmt.on_conflict_do_update(
+        index_elements=[table.c.name],
+        set_={"version": table.c.version + 1, "updated_at": stmt.excluded.updated_at},
+    ))
+
+
+def table_versions(names):
+    """Return ``{name: (version, updated_at)}`` for ``names`` in one query."""
+    table = TableVersion.__table__
+    rows = db.session.execute(select(table).where(table.c.name.in_(list(names))))
+    found = {row.name: (row.version, row.updated_at) for row in rows}
+    return {name: found.get(name, (0, None)) for name in names}
+
+
+@event.listens_for(Session, "after_flush")
+def _bump_versions_after_flush(session, flush_context):
+    names = set()
+    for obj in list(session.new) + list(session.deleted):
+        names.add(obj.__table__.name)
+    for obj in session.dirty:
+        if session.is_modified(obj, include_collections=False):
+            names.add(obj.__table__.name)
+    names.discard(TableVersion.__tablename__)
+    if names:
+        bump_table_versions(session.connection(), sorted(names))
+
+
+# favorite_type values accepted by the favorites endpoints and the model they point to
+FAVORITE_MODELS = {
+    "planet": Planet,
+    "people": People,
+    "character": People,
+}
+
+# aliases and the favorite_type stored for them, so that one entity has a
+# single row per user however the client spelled its type
+FAVORITE_ALIASES = {"people": "character"}
+
+
+def stored_favorite_type(name):
+    """The favorite_type value written to the favorites table for ``name``."""
+    return FAVORITE_ALIASES.get(name, name) if isinstance(name, str) else name
+
+
+def expand_favorites(favs):
+    """Resolve favorites to their full People/Planet rows.
+
+    Favorites are grouped by type and each group is loaded with a single
+    IN query. Targets that no longer exist (or unknown types) are returned
+    with ``"dangling": True`` instead of being looked up one by one.
+    """
+    found = {}
+    for model, ids in favorite_ids_by_model(favs).items():
+        rows = db.session.scalars(select(model).where(model.id.in_(ids)))
+        found.update({(model, row.id): row for row in rows})
+    return serialize_expanded(favs, found)
+
+
+def favorite_ids_by_model(favs):
+    ids_by_model = {}
+    for fav in favs:
+        model = FAVORITE_MODELS.get(fav.favorite_type)
+        if model is not None:
+            ids_by_model.setdefault(model, set()).add(fav.favorite_id)
+    return ids_by_model
+
+
+def serialize_expanded(favs, found):
+    """Serialize favorites with their targets from ``found``, keyed ``(model, id)``."""
+    expanded = []
+    for fav in favs:
+        target = found.get((FAVORITE_MODELS.get(fav.favorite_type), fav.favorite_id))
+        item = fav.serialize()
+        item["item"] = target.serialize() if target is not None else None
+        item["dangling"] = target is None
+        expanded.append(item)
+    return expanded
+
+
+def sync_favorites(user_id, wanted=None, add=(), remove=()):
+    """Bring a user's favorites in line with a full set or a delta.
+
+    ``wanted`` replaces the whole set; otherwise ``add``/``remove`` are
+    applied on top of the current rows. Items are ``(favorite_type,
+    favorite_id)`` tuples. The diff is written as at most one multi-row
+    DELETE and one multi-row INSERT; the caller commits.
+    """
+    current = {
+        (row.favorite_type, row.favorite_id)
+        for row in db.session.execute(
+            select(favorites.c.favorite_type, favorites.c.favorite_id)
+            .where(favorites.c.user_id == user_id)
+        )
+    }
+    if wanted is not None:
+        target = set(wanted)
+    else:
+        target = (current | set(add)) - set(remove)
+
+    to_add = sorted(target - current)
+    to_remove = sorted(current - target)
+
+    if to_remove:
+        db.session.execute(
+            delete(favorites).where(
+                favorites.c.user_id == user_id,
+                tuple_(favorites.c.favorite_type, favorites.c.favorite_id).in_(to_remove),
+            )
+        )
+    if to_add:
+        db.session.execute(dialect_insert(favorites).on_conflict_do_nothing(), [
+            {"user_id": user_id, "favorite_type": favorite_type, "favorite_id": favorite_id}
+            for favorite_type, favorite_id in to_add
+        ])
+    if to_add or to_remove:
+        from stats import record_favorites  # stats imports this module
+        record_favorites(db.session.connection(), added=to_add, removed=to_remove)
+        bump_table_versions(db.session.connection(), ["favorites"])
+
+    return {"added": len(to_add), "removed": len(to_remove), "favorites": sorted(target)}
+
+
+def favorited_by_count(model, entity_id):
+    """Number of users who favorited ``entity_id``; an index-only scan on ix_favorites_type_id."""
+    types = [name for name, target in FAVORITE_MODELS.items() if target is model]
+    return db.session.scalar(
+        select(db.func.count()).select_from(favorites).where(
+            favorites.c.favorite_type.in_(types),
+            favorites.c.favorite_id == entity_id,
+        )
+    )
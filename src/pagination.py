@@ -0,0 +1,176 @@
+"""
+Keyset (cursor) pagination helpers for the collection endpoints.
+
+Pages are keyed on the sort columns plus the primary key, so fetching
+page N costs the same index range scan as fetching page 1. The cursor
+handed to clients is an opaque urlsafe base64 token holding the key values
+of the last row; clients should never build it themselves.
+"""
+import base64
+import json
+from flask import request
+from sqlalchemy import and_, or_, false, func, select
+from models import db
+from utils import APIException, flag_arg
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+
+
+def encode_cursor(keys):
+    raw = json.dumps({"k": list(keys)}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+CURSOR_KEY_TYPES = (int, float, str, type(None))
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        keys = json.loads(base64.urlsafe_b64decode(padded.encode()))["k"]
+        if not isinstance(keys, list) or not keys:
+            raise ValueError
+        # None is the key of a NULL sort column; bool is an int subclass
+        if any(isinstance(key, bool) or not isinstance(key, CURSOR_KEY_TYPES) for key in keys):
+            raise ValueError
+        return keys
+    except (ValueError, KeyError, TypeError):
+        raise APIException("Invalid cursor", status_code=400)
+
+
+def wants_pagination():
+    """Collections keep returning a plain list unless the client opts in."""
+    return "limit" in request.args or "cursor" in request.args
+
+
+def pagination_args():
+    """Read and validate ?limit=, ?cursor= and ?count= from the request."""
+    try:
+        limit = int(request.args.get("limit", DEFAULT_LIMIT))
+    except ValueError:
+        raise APIException("limit must be an integer", status_code=400)
+    if limit < 1 or limit > MAX_LIMIT:
+        raise APIException(f"limit must be between 1 and {MAX_LIMIT}", status_code=400)
+
+    cursor = request.args.get("cursor")
+    after = decode_cursor(cursor) if cursor else None
+    with_total = flag_arg("count")
+    return {"limit": limit, "after": after, "with_total": with_total}
+
+
+def keyset_after(order, keys):
+    """WHERE clause selecting rows that sort strictly after ``keys``.
+
+    ``order`` is a list of ``(column, descending)`` pairs ending with the
+    primary key so the ordering is total. NULLs sort as the largest value
+    (see ``order_by_keys``), so a NULL key in a cursor compares with
+    IS NULL / IS NOT NULL instead of being bound as a parameter.
+    """
+    if len(keys) != len(order):
+        raise APIException("Cursor does not match the requested sort", status_code=400)
+    clauses = []
+    for i, (column, descending) in enumerate(order):
+        past = _sorts_after(column, keys[i], descending)
+        if past is None:
+            continue
+        clauses.append(and_(*[_same_key(order[j][0], keys[j]) for j in range(i)], past))
+    return or_(*clauses) if clauses else false()
+
+
+def _same_key(column, key):
+    return column.is_(None) if key is None else column == key
+
+
+def _sorts_after(column, key, descending):
+    """Rows whose ``column`` sorts strictly after ``key``; None when there are none."""
+    nullable = _nullable(column)
+    if descending:
+        if key is None:
+            return column.is_not(None)
+        return column < key
+    if key is None:
+        return None
+    return or_(column > key, column.is_(None)) if nullable else column > key
+
+
+def _nullable(column):
+    return getattr(column, "nullable", True)
+
+
+def paginate(query, id_column, serialize, limit, after=None, with_total=False, prepare=None):
+    """
+    Run one page of ``query`` ordered by ``id_column``.
+
+    One extra row is fetched to know whether another page exists, so no
+    separate COUNT is needed unless the client asked for ``total``.
+    ``prepare`` receives the page rows before serialization, e.g. to batch
+    load related data for the whole page at once.
+    """
+    total = query.order_by(None).count() if with_total else None
+
+    page_query = query
+    if after is not None:
+        page_query = page_query.filter(keyset_after([(id_column, False)], after))
+    rows = page_query.order_by(id_column).limit(limit + 1).all()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if prepare is not None:
+        prepare(rows)
+
+    body = {
+        "results": [serialize(row) for row in rows],
+        "next_cursor": encode_cursor([rows[-1].id]) if has_more else None,
+    }
+    if with_total:
+        body["total"] = total
+    return body
+
+
+def paginate_select(stmt, order, to_dict, limit, after=None, with_total=False):
+    """
+    Keyset pagination over a Core ``select``.
+
+    Every column in ``order`` must be part of the select list so its value
+    can be put in the next cursor.
+    """
+    total = db.session.scalar(count_select(stmt)) if with_total else None
+    rows = db.session.execute(page_select(stmt, order, limit, after)).all()
+    return page_body(rows, order, to_dict, limit, total, with_total)
+
+
+def count_select(stmt):
+    return select(func.count()).select_from(stmt.order_by(None).subquery())
+
+
+def page_select(stmt, order, limit, after=None):
+    """``stmt`` restricted to the page after ``after``, plus one row to detect more."""
+    if after is not None:
+        stmt = stmt.where(keyset_after(order, after))
+    return order_by_keys(stmt, order).limit(limit + 1)
+
+
+def order_by_keys(stmt, order):
+    """ORDER BY ``order`` with NULLs last ascending and first descending, as
+    Postgres does by default, so keyset_after sees the same order everywhere."""
+    clauses = []
+    for column, descending in order:
+        clause = column.desc() if descending else column.asc()
+        if _nullable(column):
+            clause = clause.nulls_first() if descending else clause.nulls_last()
+        clauses.append(clause)
+    return stmt.order_by(*clauses)
+
+
+def page_body(rows, order, to_dict, limit, total=None, with_total=False):
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    body = {
+        "results": [to_dict(row) for row in rows],
+        "next_cursor": encode_cursor([rows[-1]._mapping[column] for column, _ in order]) if has_more else None,
+    }
+    if with_total:
+        body["total"] = total
+    return body
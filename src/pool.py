@@ -0,0 +1,116 @@
+"""
+SQLAlchemy engine / connection pool configuration and stats.
+
+Pool settings come from the environment so workers can be sized against
+the database's connection limit without code changes:
+
+    DB_POOL_SIZE          persistent connections per worker (default 5)
+    DB_MAX_OVERFLOW       extra connections allowed under burst (default 10)
+    DB_POOL_TIMEOUT       seconds to wait for a free connection (default 30)
+    DB_POOL_RECYCLE       recycle connections older than N seconds (default 1800)
+    DB_POOL_PRE_PING      test connections on checkout (default on)
+    DB_PGBOUNCER          1 = let PgBouncer pool: NullPool, no prepared statements
+
+Total connections per host is workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW).
+"""
+import os
+import threading
+import time
+from sqlalchemy.pool import QueuePool, NullPool, AsyncAdaptedQueuePool
+
+
+def _env_bool(name, default):
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.lower() in ("1", "true", "yes", "on")
+
+
+class PoolWaitStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.timeouts = 0
+
+    def record(self, seconds, timed_out=False):
+        with self._lock:
+            self.checkouts += 1
+            self.total_wait += seconds
+            self.max_wait = max(self.max_wait, seconds)
+            if timed_out:
+                self.timeouts += 1
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "avg_wait_ms": round(self.total_wait / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                "max_wait_ms": round(self.max_wait * 1000, 3),
+            }
+
+
+wait_stats = PoolWaitStats()
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a connection."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except Exception:
+            wait_stats.record(time.perf_counter() - started, timed_out=True)
+            raise
+        wait_stats.record(time.perf_counter() - started)
+        return connection
+
+
+def engine_options(db_url, asyncio=False):
+    """Build SQLALCHEMY_ENGINE_OPTIONS for ``db_url`` from the environment.
+
+    ``asyncio=True`` gives the options for ``create_async_engine``.
+    """
+    options = {"pool_pre_ping": _env_bool("DB_POOL_PRE_PING", True)}
+    if db_url.startswith("sqlite"):
+        return options
+
+    if _env_bool("DB_PGBOUNCER", False):
+        # PgBouncer in transaction mode owns pooling; server-side prepared
+        # statements do not survive connection reassignment. psycopg2 never
+        # prepares; psycopg 3 does after a few executions unless told not to.
+        options["poolclass"] = NullPool
+        if db_url.startswith("postgresql+psycopg:"):
+            options["connect_args"] = {"prepare_threshold": None}
+        elif db_url.startswith("postgresql+asyncpg:"):
+            options["connect_args"] = {"statement_cache_size": 0, "prepared_statement_cache_size": 0}
+        return options
+
+    options.update({
+        "poolclass": AsyncAdaptedQueuePool if asyncio else TimedQueuePool,
+        "pool_size": int(os.getenv("DB_POOL_SIZE", 5)),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", 10)),
+        "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", 30)),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", 1800)),
+    })
+    return options
+
+
+def pool_stats(engine):
+    pool = engine.pool
+    stats = {"pool_class": type(pool).__name__, "status": pool.status()}
+    if isinstance(pool, QueuePool):
+        stats.update({
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": max(pool.overflow(), 0),
+            "max_overflow": pool._max_overflow,
+            "timeout": pool.timeout(),
+        })
+    if isinstance(pool, TimedQueuePool):
+        stats["wait"] = wait_stats.to_dict()
+    return stats
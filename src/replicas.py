@@ -0,0 +1,177 @@
+"""
+Read-replica routing.
+
+When DATABASE_REPLICA_URLS (comma separated) is set, the session of a
+GET/HEAD request is bound to one replica for the whole request; every
+other method, and anything flushed, goes to the primary.
+
+    DATABASE_REPLICA_URLS      replica URLs, e.g. two sqlite files locally
+    DATABASE_REPLICA_POLICY    round_robin (default) or least_connections
+    DATABASE_REPLICA_RETRY     seconds a failing replica sits out (default 30)
+    DATABASE_REPLICA_STICKY    seconds a client reads from the primary after
+                               one of its own writes (default 5)
+
+A replica that fails is skipped for DATABASE_REPLICA_RETRY seconds, and
+the request that hit the failure finishes on the primary.
+
+Read-your-writes: a write response sets the ``read_primary`` cookie, and
+GETs carrying it stay on the primary until it expires, so a client always
+sees its own writes regardless of replication lag.
+"""
+import itertools
+import os
+import threading
+import time
+from flask import g, request, has_request_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import OperationalError, InterfaceError
+from pool import engine_options, pool_stats
+
+READ_METHODS = ("GET", "HEAD")
+STICKY_COOKIE = "read_primary"
+
+
+class Replica:
+    def __init__(self, url):
+        self.url = url
+        self.engine = create_engine(url, **engine_options(url))
+        self.in_use = 0
+        self.failures = 0
+        self.down_until = 0.0
+        self._lock = threading.Lock()
+        event.listen(self.engine, "checkout", self._checkout)
+        event.listen(self.engine, "checkin", self._checkin)
+        event.listen(self.engine, "handle_error", self._handle_error)
+
+    def _checkout(self, dbapi_connection, record, proxy):
+        with self._lock:
+            self.in_use += 1
+
+    def _checkin(self, dbapi_connection, record):
+        with self._lock:
+            self.in_use = max(self.in_use - 1, 0)
+
+    def _handle_error(self, context):
+        if isinstance(context.sqlalchemy_exception, (OperationalError, InterfaceError)) or context.is_disconnect:
+            self.failures += 1
+            self.down_until = time.monotonic() + replica_set.retry_after
+
+    @property
+    def available(self):
+        return time.monotonic() >= self.down_until
+
+    def to_dict(self):
+        return {
+            "url": self.engine.url.render_as_string(hide_password=True),
+            "available": self.available,
+            "in_use": self.in_use,
+            "failures": self.failures,
+            "pool": pool_stats(self.engine),
+        }
+
+
+class ReplicaSet:
+    def __init__(self):
+        self.replicas = []
+        self.policy = "round_robin"
+        self.retry_after = 30.0
+        self.sticky_seconds = 5
+        self._counter = itertools.count()
+
+    def configure(self, urls, policy="round_robin", retry_after=30.0, sticky_seconds=5):
+        if policy not in ("round_robin", "least_connections"):
+            raise ValueError(f"Unknown replica policy: {policy}")
+        self.replicas = [Replica(url) for url in urls]
+        self.policy = policy
+        self.retry_after = retry_after
+        self.sticky_seconds = sticky_seconds
+
+    def choose(self):
+        """Pick an available replica, or None to fall back to the primary."""
+        candidates = [replica for replica in self.replicas if replica.available]
+        if not candidates:
+            return None
+        if self.policy == "least_connections":
+            return min(candidates, key=lambda replica: replica.in_use)
+        return candidates[next(self._counter) % len(candidates)]
+
+    def stats(self):
+        return {"policy": self.policy, "replicas": [replica.to_dict() for replica in self.replicas]}
+
+
+replica_set = ReplicaSet()
+
+
+def _request_replica():
+    """The replica this request reads from, chosen once per request."""
+    if not replica_set.replicas or not has_request_context():
+        return None
+    if "replica" not in g:
+        reads_only = request.method in READ_METHODS and STICKY_COOKIE not in request.cookies
+        g.replica = replica_set.choose() if reads_only else None
+    return g.replica
+
+
+class RoutingSession(Session):
+    """
+    Flask-SQLAlchemy session that sends read-only requests to a replica.
+
+    When the replica fails (it cannot be reached, or drops the connection),
+    the request moves to the primary and the failed call is run again there,
+    so the client never sees the replica's error.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing:
+            replica = _request_replica()
+            if replica is not None:
+                return replica.engine
+        return super().get_bind(mapper, clause=clause, bind=bind, **kwargs)
+
+    def _with_failover(self, method, *args, **kwargs):
+        replica = _request_replica()
+        failures = replica.failures if replica is not None else 0
+        try:
+            return method(*args, **kwargs)
+        except (OperationalError, InterfaceError):
+            # Replica._handle_error counts the failure if the error came
+            # from the replica; anything else (the primary failing) is raised
+            if replica is None or replica.failures == failures:
+                raise
+            g.replica = None
+            # the transaction holds the broken replica connection
+            self.rollback()
+            return method(*args, **kwargs)
+
+    def execute(self, *args, **kwargs):
+        return self._with_failover(super().execute, *args, **kwargs)
+
+    def scalar(self, *args, **kwargs):
+        return self._with_failover(super().scalar, *args, **kwargs)
+
+    def scalars(self, *args, **kwargs):
+        return self._with_failover(super().scalars, *args, **kwargs)
+
+    def connection(self, *args, **kwargs):
+        return self._with_failover(super().connection, *args, **kwargs)
+
+
+def _stick_to_primary(response):
+    if request.method not in READ_METHODS and response.status_code < 400:
+        response.set_cookie(STICKY_COOKIE, "1", max_age=replica_set.sticky_seconds, httponly=True)
+    return response
+
+
+def init_replicas(app):
+    urls = [url.strip().replace("postgres://", "postgresql://")
+            for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+    if not urls:
+        return
+    replica_set.configure(
+        urls,
+        policy=os.getenv("DATABASE_REPLICA_POLICY", "round_robin"),
+        retry_after=float(os.getenv("DATABASE_REPLICA_RETRY", 30)),
+        sticky_seconds=int(os.getenv("DATABASE_REPLICA_STICKY", 5)),
+    )
+    app.after_request(_stick_to_primary)
@@ -0,0 +1,118 @@
+"""
+Prefix name search over People and Planet.
+
+Names are tokenized into ``search_terms`` whenever a People/Planet row is
+written (ORM flushes are picked up by a session hook, bulk upserts call
+``reindex_by_uid``). A query is a single range scan on the term index:
+
+    term >= 'sky' AND term < 'skz'
+
+At most SEARCH_CANDIDATES matching terms are read in index order before
+ranking, so even one-letter queries over a very large catalog stay cheap.
+"""
+import re
+from sqlalchemy import select, delete, insert, func, case, desc, event, inspect
+from sqlalchemy.orm import Session
+from models import db, People, Planet, search_terms
+
+SEARCHABLE = {"people": People, "planet": Planet}
+SEARCH_CANDIDATES = 500
+MAX_TERM_LENGTH = 100
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(name):
+    """Return ``{term: position}`` for a name: the full name and each word."""
+    full = " ".join(_WORD.findall((name or "").lower()))[:MAX_TERM_LENGTH]
+    terms = {}
+    if full:
+        terms[full] = 0
+    for position, word in enumerate(full.split(), start=1):
+        terms.setdefault(word, position)
+    return terms
+
+
+def reindex(connection, entity_type, entities, replace=True):
+    """Replace the terms of ``entities``, an iterable of ``(id, name)``.
+
+    A name of None only removes the entity from the index. Pass
+    ``replace=False`` for freshly inserted rows that have no terms yet.
+    """
+    entities = list(entities)
+    if not entities:
+        return
+    if replace:
+        connection.execute(
+            delete(search_terms).where(
+                search_terms.c.entity_type == entity_type,
+                search_terms.c.entity_id.in_([entity_id for entity_id, _ in entities]),
+            )
+        )
+    rows = [
+        {"term": term, "entity_type": entity_type, "entity_id": entity_id,
+         "position": position, "name": name}
+        for entity_id, name in entities if name is not None
+        for term, position in tokenize(name).items()
+    ]
+    if rows:
+        connection.execute(insert(search_terms), rows)
+
+
+def reindex_by_uid(connection, model, uids):
+    """Reindex rows written by Core statements (e.g. bulk upserts)."""
+    rows = connection.execute(select(model.id, model.name).where(model.uid.in_(list(uids))))
+    reindex(connection, model.__tablename__, [(row.id, row.name) for row in rows])
+
+
+@event.listens_for(Session, "after_flush")
+def _reindex_after_flush(session, flush_context):
+    changed = {}
+    for obj in session.new:
+        if obj.__tablename__ in SEARCHABLE:
+            changed.setdefault(obj.__tablename__, []).append((obj.id, obj.name))
+    for obj in session.dirty:
+        if obj.__tablename__ in SEARCHABLE and inspect(obj).attrs.name.history.has_changes():
+            changed.setdefault(obj.__tablename__, []).append((obj.id, obj.name))
+    for obj in session.deleted:
+        if obj.__tablename__ in SEARCHABLE:
+            changed.setdefault(obj.__tablename__, []).append((obj.id, None))
+
+    for entity_type, entities in changed.items():
+        reindex(session.connection(), entity_type, entities)
+
+
+def _prefix_upper_bound(prefix):
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def search(query, entity_type=None, limit=10):
+    """
+    Return ranked ``{"type", "id", "name"}`` matches for a name prefix.
+
+    Ranking: exact term matches first, then matches on the start of the
+    name before matches on a later word, then shorter names.
+    """
+    prefix = " ".join(_WORD.findall(query.lower()))[:MAX_TERM_LENGTH]
+    if not prefix:
+        return []
+
+    t = search_terms
+    candidates = select(t).where(t.c.term >= prefix, t.c.term < _prefix_upper_bound(prefix))
+    if entity_type:
+        candidates = candidates.where(t.c.entity_type == entity_type)
+    candidates = candidates.order_by(t.c.term).limit(SEARCH_CANDIDATES).subquery()
+
+    c = candidates.c
+    exact = func.max(case((c.term == prefix, 1), else_=0)).label("exact")
+    position = func.min(c.position).label("position")
+    stmt = (
+        select(c.entity_type, c.entity_id, c.name, exact, position)
+        .group_by(c.entity_type, c.entity_id, c.name)
+        .order_by(desc(exact), position, func.length(c.name), c.name)
+        .limit(limit)
+    )
+    return [
+        {"type": row.entity_type, "id": row.entity_id, "name": row.name}
+        for row in db.session.execute(stmt)
+    ]
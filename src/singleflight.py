@@ -0,0 +1,135 @@
+"""
+Single-flight for cold collection reads.
+
+When many identical requests miss at the same moment (every worker just
+restarted, or a write bumped the table version), only the first one runs
+the query and encodes the body; the others wait for it and share its
+result. Requests are identical when they have the same path and
+collection ETag, i.e. the same table versions, query string and Accept
+header, so a write starts a new flight and different filters or pages
+get their own.
+
+Flights are per worker process: a cold key costs one query per worker,
+not one per request.
+
+    STALE_WHILE_REVALIDATE   1 = while a collection snapshot is being
+                             rebuilt, serve the previous snapshot to other
+                             requests instead of making them wait (default 0)
+"""
+import asyncio
+import os
+import threading
+from flask import current_app, request, g
+from models import db
+
+STALE_WHILE_REVALIDATE = os.getenv("STALE_WHILE_REVALIDATE", "0").lower() in ("1", "true", "yes")
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SingleFlight:
+    def __init__(self, before_wait=None):
+        self.before_wait = before_wait
+        self._calls = {}
+        self._futures = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.shared = 0
+        self.stale = 0
+
+    def do(self, key, fn):
+        """Return ``fn()``, running it once for all concurrent callers of ``key``."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+            else:
+                self.shared += 1
+
+        if not leader:
+            if self.before_wait is not None:
+                self.before_wait()
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+
+        try:
+            call.value = fn()
+            return call.value
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    async def do_async(self, key, fn):
+        """``do`` for a coroutine function, shared by the tasks of one event loop."""
+        future = self._futures.get(key)
+        if future is not None:
+            self.count("shared")
+            return await asyncio.shield(future)
+
+        future = self._futures[key] = asyncio.get_running_loop().create_future()
+        self.count("leaders")
+        try:
+            value = await fn()
+            future.set_result(value)
+            return value
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # retrieved here, so no warning when nobody waited
+            raise
+        finally:
+            del self._futures[key]
+            if not future.done():
+                future.cancel()
+
+    def in_flight(self, key):
+        return key in self._calls or key in self._futures
+
+    def count(self, outcome):
+        with self._lock:
+            setattr(self, outcome, getattr(self, outcome) + 1)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "leaders": self.leaders,
+                "shared": self.shared,
+                "stale": self.stale,
+                "in_flight": len(self._calls) + len(self._futures),
+                "stale_while_revalidate": STALE_WHILE_REVALIDATE,
+            }
+
+
+def _release_connection():
+    # a waiting request needs no connection; hand it back to the pool so a
+    # burst of waiters cannot starve the leader or later requests
+    db.session.rollback()
+
+
+collection_flight = SingleFlight(before_wait=_release_connection)
+
+
+def flight_key():
+    """Query signature of the current collection request; needs ``conditional_collection``."""
+    return f"{request.path}|{g.collection_etag}"
+
+
+def shared_json(build):
+    """
+    A JSON response whose body is ``build()``, encoded once for every
+    concurrent request with the same query signature.
+    """
+    body = collection_flight.do(flight_key(), lambda: current_app.json.response(build()).get_data())
+    return current_app.response_class(body, mimetype=current_app.json.mimetype)
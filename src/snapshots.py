@@ -0,0 +1,97 @@
+"""
+Pre-rendered snapshots of full collection responses.
+
+For a plain ``GET /planets`` or ``GET /people`` (no query params) the
+encoded JSON body, plus gzip and, when the ``brotli`` package is
+installed, brotli variants, are kept per worker keyed on the table's
+``table_version``. Any write bumps that version, so the next GET after a
+write rebuilds the snapshot once and every GET after that is a dictionary
+lookup and a socket write. Concurrent requests that find the snapshot out
+of date share one rebuild (see singleflight.py); with
+STALE_WHILE_REVALIDATE they are sent the previous snapshot, under its own
+validators, while it runs.
+
+Must be called from a view wrapped in ``conditional_collection``, which
+puts the current table versions and ETag on ``g``.
+"""
+import threading
+from flask import current_app, request, g
+from conditional import ENCODING_ETAG_SUFFIXES, collection_validators
+from compression import ENCODINGS, COMPRESS_MIN_SIZE, compress_body, choose_encoding
+from streaming import wants_stream
+from singleflight import collection_flight, STALE_WHILE_REVALIDATE
+
+_snapshots = {}
+_lock = threading.Lock()
+
+
+class Snapshot:
+    def __init__(self, version, body, last_modified=None):
+        self.version = version
+        self.last_modified = last_modified
+        self.bodies = {"identity": body}
+        if len(body) >= COMPRESS_MIN_SIZE:
+            for encoding in ENCODINGS:
+                if encoding != "deflate":
+                    self.bodies[encoding] = compress_body(body, encoding)
+
+
+def wants_snapshot():
+    return not request.args and not wants_stream()
+
+
+def current_snapshot(table, version):
+    snapshot = _snapshots.get(table)
+    return snapshot if snapshot is not None and snapshot.version == version else None
+
+
+def store_snapshot(table, version, data, last_modified=None):
+    snapshot = Snapshot(version, current_app.json.dumps_bytes(data), last_modified)
+    with _lock:
+        current = _snapshots.get(table)
+        if current is None or current.version <= version:
+            _snapshots[table] = snapshot
+    return snapshot
+
+
+def snapshot_response(table, build):
+    """
+    Serve the snapshot of ``table``, calling ``build()`` for the body data
+    only if the table changed since the snapshot was taken.
+    """
+    version = g.collection_versions[table][0]
+    _, last_modified = collection_validators(list(g.collection_versions), g.collection_versions)
+    snapshot = current_snapshot(table, version)
+    if snapshot is None:
+        key = f"snapshot:{table}:{version}"
+        stale = stale_snapshot(table, key)
+        if stale is not None:
+            return stale
+        snapshot = collection_flight.do(key, lambda: current_snapshot(table, version)
+                                        or store_snapshot(table, version, build(), last_modified))
+    return send_snapshot(snapshot)
+
+
+def stale_snapshot(table, key):
+    """The previous snapshot of ``table`` as a response, if another request
+    is rebuilding it (``key``) and stale-while-revalidate is on."""
+    previous = _snapshots.get(table)
+    if not STALE_WHILE_REVALIDATE or previous is None or not collection_flight.in_flight(key):
+        return None
+    collection_flight.count("stale")
+    etag, _ = collection_validators([table], {table: (previous.version, None)})
+    return send_snapshot(previous, etag)
+
+
+def send_snapshot(snapshot, etag=None):
+    encoding = choose_encoding(snapshot.bodies)
+    response = current_app.response_class(snapshot.bodies[encoding], mimetype="application/json")
+    response.vary.add("Accept-Encoding")
+    if snapshot.last_modified is not None:
+        response.last_modified = snapshot.last_modified
+    etag = etag or g.collection_etag
+    if encoding != "identity":
+        response.headers["Content-Encoding"] = encoding
+        etag += ENCODING_ETAG_SUFFIXES[encoding]
+    response.set_etag(etag)
+    return response
@@ -0,0 +1,307 @@
+"""
+Aggregate statistics served under /stats.
+
+The figures are read from the ``stat_counters`` summary table instead of
+being computed with GROUP BY over the catalog on every call. Each row holds
+a count (and, for planets, a population total) for one value of one
+statistic:
+
+    planet_climate / planet_terrain   planets per value, population sum
+    people_gender / people_homeworld  people per value (homeworld = planet id)
+    favorite_planet / favorite_people times each entity was favorited
+    favorite_total                    favorites per type
+
+Every write keeps the counters current in the same transaction with one
+multi-row upsert of deltas: the Core writes in writes.py and bulk.py, the
+favorites statements, and ORM flushes (via the session hooks below).
+Statements that bypass all of those (raw SQL, Query.delete()) are not seen;
+``check_stats`` recomputes everything with GROUP BY and reports rows that
+differ (``flask check-stats``), and ``rebuild_stats`` replaces the
+table with those results (``flask rebuild-stats``). Run the check when
+writes are quiet, as concurrent writes can show up as transient
+differences.
+"""
+from flask import request
+from sqlalchemy import select, insert, update, delete, func, literal, event, inspect
+from sqlalchemy.orm import Session
+from models import db, Planet, People, favorites, stat_counters, dialect_insert, FAVORITE_MODELS
+from utils import APIException
+
+UNKNOWN = "unknown"
+DEFAULT_TOP = 10
+MAX_TOP = 1000
+REBUILD_BATCH = 1000
+
+# stat -> (model, grouped column, summed column or None)
+GROUPS = {
+    "planet_climate": (Planet, "climate", "population"),
+    "planet_terrain": (Planet, "terrain", "population"),
+    "people_gender": (People, "gender", None),
+    "people_homeworld": (People, "homeworld_id", None),
+}
+
+# columns of each model that feed a statistic
+STAT_COLUMNS = {}
+for _model, _column, _summed in GROUPS.values():
+    STAT_COLUMNS.setdefault(_model, set()).update(c for c in (_column, _summed) if c)
+
+FAVORITE_TYPES = ("planet", "people")
+
+
+def _key(value):
+    return UNKNOWN if value is None else str(value)
+
+
+def row_deltas(model, values, sign):
+    """Counter changes for adding (sign=1) or removing (sign=-1) one row."""
+    return [
+        (stat, _key(values[column]), sign, sign * (values[summed] or 0) if summed else 0)
+        for stat, (target, column, summed) in GROUPS.items() if target is model
+    ]
+
+
+def favorite_type(name):
+    """Table name a favorite_type refers to ("character" is stored for People too)."""
+    model = FAVORITE_MODELS.get(name)
+    return model.__tablename__ if model is not None else name
+
+
+def favorite_deltas(items, sign):
+    """Counter changes for favorites ``items``, ``(favorite_type, favorite_id)`` tuples."""
+    deltas = []
+    for name, favorite_id in items:
+        kind = favorite_type(name)
+        deltas.append((f"favorite_{kind}", _key(favorite_id), sign, 0))
+        deltas.append(("favorite_total", kind, sign, 0))
+    return deltas
+
+
+def apply_deltas(connection, deltas):
+    """Add ``(stat, key, count, total)`` deltas to the counters with one upsert."""
+    merged = {}
+    for stat, key, count, total in deltas:
+        current = merged.get((stat, key), (0, 0))
+        merged[(stat, key)] = (current[0] + count, current[1] + total)
+    # sorted so concurrent transactions lock the rows in the same order
+    rows = [
+        {"stat": stat, "key": key, "count": count, "total": total}
+        for (stat, key), (count, total) in sorted(merged.items()) if count or total
+    ]
+    if not rows:
+        return
+    table = stat_counters
+    try:
+        stmt = dialect_insert(table, connection)
+    except NotImplementedError:
+        for row in rows:
+            result = connection.execute(
+                update(table).where(table.c.stat == row["stat"], table.c.key == row["key"])
+                .values(count=table.c.count + row["count"], total=table.c.total + row["total"])
+            )
+            if result.rowcount == 0:
+                connection.execute(insert(table).values(**row))
+        return
+    stmt = stmt.values(rows)
+    connection.execute(stmt.on_conflict_do_update(
+        index_elements=[table.c.stat, table.c.key],
+        set_={"count": table.c.count + stmt.excluded.count, "total": table.c.total + stmt.excluded.total},
+    ))
+
+
+def record_rows(connection, model, old=(), new=()):
+    """Move counters from the ``old`` column values of rows to their ``new`` ones.
+
+    Both are iterables of mappings holding at least ``STAT_COLUMNS[model]``.
+    """
+    if model not in STAT_COLUMNS:
+        return
+    deltas = []
+    for values in old:
+        deltas.extend(row_deltas(model, values, -1))
+    for values in new:
+        deltas.extend(row_deltas(model, values, 1))
+    apply_deltas(connection, deltas)
+
+
+def record_favorites(connection, added=(), removed=()):
+    apply_deltas(connection, favorite_deltas(added, 1) + favorite_deltas(removed, -1))
+
+
+def stat_values(obj, columns=None):
+    return {column: getattr(obj, column) for column in columns or STAT_COLUMNS[type(obj)]}
+
+
+@event.listens_for(Session, "before_flush")
+def _stats_before_flush(session, flush_context, instances):
+    # old values must be read before the flush overwrites or deletes them
+    removed = []
+    changed = {}
+    for obj in session.deleted:
+        if type(obj) in STAT_COLUMNS:
+            removed.append((type(obj), stat_values(obj)))
+    for obj in session.dirty:
+        columns = STAT_COLUMNS.get(type(obj))
+        if columns and obj not in session.deleted:
+            state = inspect(obj)
+            old = {}
+            for column in columns:
+                history = state.attrs[column].load_history()
+                previous = history.deleted or history.unchanged or history.added
+                old[column] = previous[0] if previous else None
+            changed[obj] = old
+    session.info["stat_changes"] = (removed, changed)
+
+
+@event.listens_for(Session, "after_flush")
+def _stats_after_flush(session, flush_context):
+    removed, changed = session.info.pop("stat_changes", ((), {}))
+    deltas = []
+    for model, values in removed:
+        deltas.extend(row_deltas(model, values, -1))
+    for obj, old in changed.items():
+        # foreign keys set through relationships are only known after the flush
+        new = stat_values(obj, old)
+        if new != old:
+            deltas.extend(row_deltas(type(obj), old, -1) + row_deltas(type(obj), new, 1))
+    for obj in session.new:
+        if type(obj) in STAT_COLUMNS:
+            deltas.extend(row_deltas(type(obj), stat_values(obj), 1))
+    if deltas:
+        apply_deltas(session.connection(), deltas)
+
+
+def top_arg(default=DEFAULT_TOP):
+    try:
+        top = int(request.args.get("limit", default))
+    except ValueError:
+        raise APIException("limit must be an integer", status_code=400)
+    if top < 1 or top > MAX_TOP:
+        raise APIException(f"limit must be between 1 and {MAX_TOP}", status_code=400)
+    return top
+
+
+def _counters(stats, limit=None):
+    """``{stat: [(key, count, total), ...]}``, largest count first."""
+    c = stat_counters.c
+    stmt = (
+        select(c.stat, c.key, c.count, c.total)
+        .where(c.stat.in_(stats), c.count > 0)
+        .order_by(c.stat, c.count.desc(), c.key)
+    )
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    by_stat = {stat: [] for stat in stats}
+    # unpacked rather than read as row.count, which is tuple.count on a Row
+    for stat, key, count, total in db.session.execute(stmt):
+        by_stat[stat].append((key, count, total))
+    return by_stat
+
+
+def planet_stats():
+    counters = _counters(["planet_climate", "planet_terrain"])
+    climate = [{"value": key, "count": count, "population": total}
+               for key, count, total in counters["planet_climate"]]
+    terrain = [{"value": key, "count": count, "population": total}
+               for key, count, total in counters["planet_terrain"]]
+    return {
+        "count": sum(item["count"] for item in climate),
+        "population_total": sum(item["population"] for item in climate),
+        "climate": climate,
+        "terrain": terrain,
+    }
+
+
+def people_stats(top):
+    gender = [{"value": key, "count": count} for key, count, _ in _counters(["people_gender"])["people_gender"]]
+    homeworld = [
+        {"planet_id": None if key == UNKNOWN else int(key), "count": count}
+        for key, count, _ in _counters(["people_homeworld"], limit=top)["people_homeworld"]
+    ]
+    return {"count": sum(item["count"] for item in gender), "gender": gender, "homeworld": homeworld}
+
+
+def favorite_type_arg():
+    kind = request.args.get("type")
+    if kind is not None and kind not in FAVORITE_MODELS:
+        raise APIException("type must be one of: " + ", ".join(sorted(FAVORITE_MODELS)), status_code=400)
+    return kind
+
+
+def favorite_stats(top, kind=None):
+    """Favorite totals per type and the ``top`` most favorited entities, with names."""
+    kinds = [favorite_type(kind)] if kind else list(FAVORITE_TYPES)
+
+    totals = {key: count for key, count, _ in _counters(["favorite_total"])["favorite_total"]}
+    ranked = []
+    for name in kinds:
+        # one (stat, count) index range per type, merged below
+        stat = f"favorite_{name}"
+        ranked.extend((name, int(key), count) for key, count, _ in _counters([stat], limit=top)[stat])
+    ranked.sort(key=lambda item: (-item[2], item[0], item[1]))
+    ranked = ranked[:top]
+
+    names = {}
+    for name in kinds:
+        model = FAVORITE_MODELS[name]
+        ids = [entity_id for kind_name, entity_id, _ in ranked if kind_name == name]
+        if ids:
+            rows = db.session.execute(select(model.id, model.name).where(model.id.in_(ids)))
+            names.update({(name, entity_id): entity_name for entity_id, entity_name in rows})
+    return {
+        "total": sum(totals.get(name, 0) for name in kinds),
+        "by_type": {name: totals.get(name, 0) for name in kinds},
+        "most_favorited": [
+            {"type": name, "id": entity_id, "name": names.get((name, entity_id)), "count": count}
+            for name, entity_id, count in ranked
+        ],
+    }
+
+
+def expected_counters(connection):
+    """``{(stat, key): (count, total)}`` recomputed from the catalog with GROUP BY."""
+    expected = {}
+    for stat, (model, column, summed) in GROUPS.items():
+        grouped = getattr(model, column)
+        total = func.coalesce(func.sum(getattr(model, summed)), 0) if summed else literal(0)
+        for row in connection.execute(select(grouped, func.count(), total).group_by(grouped)):
+            expected[(stat, _key(row[0]))] = (row[1], int(row[2]))
+
+    f = favorites.c
+    rows = connection.execute(select(f.favorite_type, f.favorite_id, func.count()).group_by(f.favorite_type, f.favorite_id))
+    for name, favorite_id, count in rows:
+        kind = favorite_type(name)
+        for key in ((f"favorite_{kind}", _key(favorite_id)), ("favorite_total", kind)):
+            current = expected.get(key, (0, 0))
+            expected[key] = (current[0] + count, 0)
+    return expected
+
+
+def check_stats(connection):
+    """Compare the counters with a full recomputation; lists every differing row."""
+    expected = expected_counters(connection)
+    c = stat_counters.c
+    stored = {
+        (stat, key): (count, total)
+        for stat, key, count, total in connection.execute(select(c.stat, c.key, c.count, c.total))
+        if count or total
+    }
+    mismatches = [
+        {"stat": stat, "key": key,
+         "expected": dict(zip(("count", "total"), expected.get((stat, key), (0, 0)))),
+         "stored": dict(zip(("count", "total"), stored.get((stat, key), (0, 0))))}
+        for stat, key in sorted(set(expected) | set(stored))
+        if expected.get((stat, key), (0, 0)) != stored.get((stat, key), (0, 0))
+    ]
+    return {"consistent": not mismatches, "rows": len(expected), "mismatches": mismatches}
+
+
+def rebuild_stats(connection):
+    """Replace every counter with a full recomputation; the caller commits."""
+    rows = [
+        {"stat": stat, "key": key, "count": count, "total": total}
+        for (stat, key), (count, total) in sorted(expected_counters(connection).items())
+    ]
+    connection.execute(delete(stat_counters))
+    for start in range(0, len(rows), REBUILD_BATCH):
+        connection.execute(insert(stat_counters), rows[start:start + REBUILD_BATCH])
+    return len(rows)
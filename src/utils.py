@@ -1,4 +1,4 @@
-from flask import jsonify, url_for
+from flask import jsonify, url_for, request
 
 class APIException(Exception):
     status_code = 400
@@ -15,6 +15,15 @@ class APIException(Exception):
         rv['message'] = self.message
         return rv
 
+def list_arg(name):
+    """Return a comma separated query param such as ?include=a,b as a set."""
+    value = request.args.get(name, "")
+    return {item.strip() for item in value.split(",") if item.strip()}
+
+def flag_arg(name):
+    """True when a boolean query param such as ?expand=1 is switched on."""
+    return request.args.get(name, "").lower() in ("1", "true", "yes")
+
 def has_no_empty_params(rule):
     defaults = rule.defaults if rule.defaults is not None else ()
     arguments = rule.arguments if rule.arguments is not None else ()
@@ -0,0 +1,161 @@
+"""
+Single-statement writes for the User, Planet and People endpoints.
+
+A create is one ``INSERT ... RETURNING``, an update one ``UPDATE ... WHERE
+id = :id RETURNING`` over a whitelist of columns, and a delete one
+``DELETE ... RETURNING``, preceded for planets by ``clear_references``,
+which takes the homeworld off their inhabitants. Uniqueness and references
+are left to the database's constraints rather than checked with SELECTs
+first, which also closes the race between the check and the write;
+``constraint_error`` turns a violation into a 409 (duplicate, or still
+referenced) or 400.
+
+The ORM flush hooks do not see these statements, so the table_version bump,
+search index rows and /stats counters are written here in the same
+transaction. Callers commit.
+"""
+import re
+from flask import request, jsonify
+from sqlalchemy import select, insert, update, delete
+from models import db, bump_table_versions, Planet, People
+from bulk import validate_record
+from search import SEARCHABLE, reindex
+from stats import STAT_COLUMNS, record_rows, stat_values
+from utils import APIException
+
+USER_FIELDS = {"username": str, "email": str}
+
+# foreign keys set to NULL when the row they point at is deleted, as the
+# ORM did through the ``inhabitants`` backref
+NULLED_ON_DELETE = {Planet: [(People, "homeworld_id")]}
+
+_SQLITE_COLUMN = re.compile(r"constraint failed: \w+\.(\w+)")
+_POSTGRES_COLUMN = re.compile(r"Key \((\w+)\)")
+
+
+def create_args(fields, columns=None):
+    """Validate a create body: every field present and of the right type."""
+    row, error = validate_record(request.get_json(silent=True), fields, columns)
+    if error:
+        raise APIException(error, status_code=400, payload={"error": error})
+    return row
+
+
+def update_args(fields, columns=None):
+    """Validate an update body. Only whitelisted fields are written; other keys
+    (``id``, ``version``, ...) are ignored as they were before."""
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        raise APIException("Body must be a JSON object", status_code=400)
+    present = {field: kind for field, kind in fields.items() if field in data}
+    if not present:
+        raise APIException("No updatable fields", status_code=400,
+                           payload={"updatable": sorted(fields)})
+    row, error = validate_record(data, present, columns)
+    if error:
+        raise APIException(error, status_code=400, payload={"error": error})
+    return row
+
+
+def _detach(entity):
+    # RETURNING already loaded every column; detaching keeps them readable
+    # after commit instead of expiring them and re-SELECTing the row.
+    db.session.expunge(entity)
+    return entity
+
+
+def _after_write(model, entity_id, name, replace=True, old=(), new=()):
+    connection = db.session.connection()
+    if model.__tablename__ in SEARCHABLE and (name is not None or replace):
+        reindex(connection, model.__tablename__, [(entity_id, name)], replace=replace)
+    record_rows(connection, model, old, new)
+    bump_table_versions(connection, [model.__tablename__])
+
+
+def _stat_columns(model):
+    return [getattr(model, column) for column in sorted(STAT_COLUMNS.get(model, ()))]
+
+
+def create_entity(model, row):
+    """INSERT ``row`` and return the new instance, built from RETURNING."""
+    entity = db.session.scalar(insert(model).values(**row).returning(model))
+    new = [stat_values(entity)] if model in STAT_COLUMNS else ()
+    _after_write(model, entity.id, getattr(entity, "name", None), replace=False, new=new)
+    return _detach(entity)
+
+
+def update_entity(model, entity_id, row):
+    """UPDATE whitelisted columns of one row; None when it does not exist."""
+    old = ()
+    if STAT_COLUMNS.get(model, set()) & set(row):
+        # the counters need the values being replaced; lock the row so a
+        # concurrent update cannot change them in between
+        current = db.session.execute(
+            select(*_stat_columns(model)).where(model.id == entity_id).with_for_update()
+        ).mappings().first()
+        if current is None:
+            return None
+        old = [current]
+    entity = db.session.scalar(
+        update(model).where(model.id == entity_id).values(**row).returning(model)
+        .execution_options(synchronize_session=False, populate_existing=True)
+    )
+    if entity is None:
+        return None
+    new = [stat_values(entity)] if old else ()
+    _after_write(model, entity.id, entity.name if "name" in row else None, replace="name" in row,
+                 old=old, new=new)
+    return _detach(entity)
+
+
+def delete_entity(model, entity_id):
+    """DELETE one row; False when it does not exist."""
+    deleted = db.session.execute(
+        delete(model).where(model.id == entity_id).returning(model.id, *_stat_columns(model))
+    ).mappings().first()
+    if deleted is None:
+        return False
+    _after_write(model, entity_id, None, old=[deleted])
+    return True
+
+
+def clear_references(model, entity_id):
+    """
+    Set the NULLED_ON_DELETE foreign keys pointing at one row to NULL, ahead
+    of deleting it. Returns ``{referencing model: [ids]}`` of the rows changed.
+    """
+    changed = {}
+    for referencing, column in NULLED_ON_DELETE.get(model, ()):
+        key = getattr(referencing, column)
+        rows = db.session.execute(
+            update(referencing).where(key == entity_id).values({column: None})
+            .returning(referencing.id, *_stat_columns(referencing))
+            .execution_options(synchronize_session=False)
+        ).mappings().all()
+        if not rows:
+            continue
+        # RETURNING gives the new values; the old key is the deleted row's id
+        record_rows(db.session.connection(), referencing, old=[{**row, column: entity_id} for row in rows], new=rows)
+        bump_table_versions(db.session.connection(), [referencing.__tablename__])
+        changed[referencing] = [row["id"] for row in rows]
+    return changed
+
+
+def constraint_error(e, model):
+    """Response for an IntegrityError raised by one of the writes above."""
+    db.session.rollback()
+    message = str(e.orig)
+    code = getattr(e.orig, "pgcode", None) or getattr(e.orig, "sqlstate", None)
+    match = _SQLITE_COLUMN.search(message) or _POSTGRES_COLUMN.search(message)
+    column = match.group(1) if match else None
+
+    if code == "23505" or "UNIQUE constraint" in message:
+        text = f"{column.capitalize()} already exists" if column else "Duplicate value"
+        return jsonify({"error": text}), 409
+    if code == "23503" or "FOREIGN KEY constraint" in message:
+        if request.method == "DELETE":
+            return jsonify({"error": f"{model.__name__} is still referenced"}), 409
+        return jsonify({"error": "Referenced record does not exist"}), 400
+    if code == "23502" or "NOT NULL constraint" in message:
+        return jsonify({"error": f"'{column}' cannot be null" if column else "Missing value"}), 400
+    return jsonify({"error": "Constraint violation", "message": message}), 400
@@ -0,0 +1,41 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+# app.py reads these at import time
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "test.db")
+os.environ.pop("DATABASE_REPLICA_URLS", None)
+os.environ["SERVER_TIMING"] = "1"
+
+
+@pytest.fixture(scope="session")
+def app():
+    from app import app
+    from models import db, Planet, People
+
+    with app.app_context():
+        db.create_all()
+        for i in range(1, 31):
+            db.session.add(Planet(
+                uid=i, name=f"Planet {i}", climate="arid", diameter=i * 100, gravity="1 standard",
+                orbital_period=300, population=i * 1000, rotation_period=24, terrain="desert",
+                url=f"https://swapi.tech/api/planets/{i}",
+            ))
+        db.session.flush()
+        for i in range(1, 61):
+            db.session.add(People(
+                uid=i, name=f"Person {i}", gender="female" if i % 2 else "male", skin_color="fair",
+                hair_color="brown", height=170, eye_color="blue", mass=70,
+                homeworld_id=i % 30 + 1 if i % 3 else 1, birth_year="19BBY",
+                url=f"https://swapi.tech/api/people/{i}",
+            ))
+        db.session.commit()
+    yield app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
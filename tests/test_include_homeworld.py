@@ -0,0 +1,39 @@
+"""
+Listing people with their homeworlds, or a planet's inhabitants, must run
+the same number of SQL statements whatever the page size: homeworlds are
+loaded in one batch, not one query per person.
+"""
+import re
+
+import pytest
+
+
+def statement_count(response):
+    assert response.status_code == 200, response.get_data(as_text=True)
+    match = re.search(r'desc="(\d+) statements?"', response.headers["Server-Timing"])
+    assert match, response.headers["Server-Timing"]
+    return int(match.group(1))
+
+
+@pytest.mark.parametrize("query", [
+    "include=homeworld",
+    "include=homeworld&sort=name",
+    "include=homeworld&gender=female",
+])
+def test_people_with_homeworld(client, query):
+    small = client.get(f"/people?{query}&limit=5")
+    large = client.get(f"/people?{query}&limit=40")
+
+    assert len(large.get_json()["results"]) > 5
+    assert all(person["homeworld_planet"] for person in large.get_json()["results"])
+    assert statement_count(large) == statement_count(small)
+
+
+def test_planet_inhabitants(client):
+    # warm the planet entity so both requests see the same cache state
+    client.get("/planets/1")
+    small = client.get("/planets/1/inhabitants?limit=5")
+    large = client.get("/planets/1/inhabitants?limit=40")
+
+    assert len(large.get_json()["results"]) > 5
+    assert statement_count(large) == statement_count(small)